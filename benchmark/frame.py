@@ -0,0 +1,102 @@
+# benchmark/frame.py
+# 渲染流程基准测试：无终端运行完整的帧流程（视口提取、双缓冲比较、HUD、输出）
+#
+# 用法: python -m benchmark.frame [--size 1000] [--term 200x60] [--steps 500]
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from core.player import Player
+from core.time import GameTime
+from core.tile import TRANSPARENT, new_tiles, save_tiles
+from core.world import World
+from renderer import HeadlessRenderer
+from translation import Translator
+
+# 对比的渲染配置 {名称: HeadlessRenderer 参数}
+BACKENDS = {
+    "no-scroll": {"scroll": False},
+    "scroll": {"scroll": True},
+    "256-color": {"color_depth": "256"},
+    "16-color": {"color_depth": "16"},
+    "no-color": {"color": False},
+}
+
+
+def generate_map(path: Path, size: int, seed: int = 0):
+    """生成带随机花草纹理的测试地图（少量颜色，大部分格子有字符）"""
+    rng = np.random.default_rng(seed)
+    tiles = new_tiles(size, size)
+    glyphs = np.array([ord(c) for c in " .,'\"`*"], dtype=np.uint32)
+    palette = np.array(
+        [(60, 140, 60), (90, 170, 70), (200, 200, 80), (120, 90, 60)], dtype=np.uint8
+    )
+    tiles["char"] = glyphs[rng.integers(0, len(glyphs), (size, size))]
+    tiles["rgb"] = palette[rng.integers(0, len(palette), (size, size))]
+    tiles["flags"][tiles["char"] != ord(" ")] &= ~TRANSPARENT & 0xFF
+    save_tiles(path, tiles)
+
+
+def walk(steps: int, seed: int = 0):
+    """生成固定的移动序列：每段随机方向走若干步"""
+    rng = np.random.default_rng(seed)
+    moves = []
+    while len(moves) < steps:
+        dx, dy = [(0, -1), (0, 1), (-1, 0), (1, 0)][rng.integers(4)]
+        moves += [(dx, dy)] * int(rng.integers(5, 30))
+    return moves[:steps]
+
+
+def run(world, renderer, moves, game_time=None):
+    """
+    按移动序列逐帧渲染
+    :return: (每帧耗时数组, 每帧字节数数组)
+    """
+    player = Player(world.width // 2, world.height // 2)
+    renderer.draw(world, player, game_time)  # 首帧（全部绘制）不计入
+
+    times, sizes = [], []
+    for dx, dy in moves:
+        player.move(dx, dy, world)
+        start = time.perf_counter()
+        renderer.draw(world, player, game_time, "benchmark")
+        times.append(time.perf_counter() - start)
+        sizes.append(renderer.bytes_written)
+    return np.array(times), np.array(sizes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="渲染流程基准测试")
+    parser.add_argument("--size", type=int, default=1000, help="地图边长")
+    parser.add_argument("--term", default="200x60", help="虚拟终端大小 宽x高")
+    parser.add_argument("--steps", type=int, default=500, help="移动步数")
+    args = parser.parse_args()
+
+    width, height = map(int, args.term.split("x"))
+    moves = walk(args.steps)
+    game_time = GameTime(translator=Translator())
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "bench.npy"
+        generate_map(path, args.size)
+        world = World(path)
+
+        print(f"地图 {args.size}x{args.size}，终端 {width}x{height}，{len(moves)} 步")
+        for name, options in BACKENDS.items():
+            renderer = HeadlessRenderer(width, height, view_h=height - 10, **options)
+            world.quantize(renderer.quantizer)
+            times, sizes = run(world, renderer, moves, game_time)
+            print(
+                f"  {name:10s}"
+                f"  平均 {times.mean() * 1000:6.3f} ms"
+                f"  p95 {np.percentile(times, 95) * 1000:6.3f} ms"
+                f"  平均 {sizes.mean():8.0f} 字节/帧"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+# benchmark/map_load.py
+# 地图加载基准测试：一次性读入 vs 内存映射
+#
+# 用法: python -m benchmark.map_load [--sizes 1000 10000]
+
+import argparse
+import os
+import resource
+import tempfile
+import time
+from multiprocessing import get_context
+from pathlib import Path
+
+from core.tile import new_tiles, save_tiles, set_color, set_terrain
+from core.world import World
+
+
+def generate_map(path: Path, size: int):
+    """生成 size x size 的测试地图（带边框和一块田地）"""
+    tiles = new_tiles(size, size)
+    set_terrain(tiles, 1)
+    set_color(tiles[: size // 4, : size // 4], (90, 160, 60))
+    set_terrain(tiles[size // 2 :, size // 2 :], 2)
+    for edge in (tiles[0, :], tiles[-1, :], tiles[:, 0], tiles[:, -1]):
+        edge["char"] = ord("#")
+        edge["flags"] &= 0xFE
+    save_tiles(path, tiles)
+
+
+def resident_mb():
+    """当前进程常驻内存 (MB)，非 Linux 系统退化为峰值内存"""
+    statm = Path("/proc/self/statm")
+    if statm.exists():
+        pages = int(statm.read_text().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def measure(path: str, mmap_mode):
+    """
+    在独立子进程中测量，避免两种模式互相影响
+    :return: (加载耗时, 首帧视口耗时, 常驻内存 MB)
+    """
+    start = time.perf_counter()
+    world = World(path, mmap_mode=mmap_mode)
+    loaded = time.perf_counter()
+
+    # 模拟首帧：玩家在地图中央，200x60 的终端
+    view = world.get_view(world.width // 2, world.height // 2, 200, 60)
+    view.compose()
+    world.is_walkable(world.width // 2, world.height // 2)
+    first_frame = time.perf_counter()
+
+    return loaded - start, first_frame - loaded, resident_mb()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="地图加载基准测试")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000])
+    args = parser.parse_args()
+
+    ctx = get_context("spawn")
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            path = Path(tmp) / f"bench_{size}.npy"
+            generate_map(path, size)
+            mb = path.stat().st_size / 1024 / 1024
+            print(f"地图 {size}x{size} ({mb:.1f} MB)")
+
+            for label, mode in (("eager", None), ("mmap ", "r")):
+                with ctx.Pool(1) as pool:
+                    load, frame, rss = pool.apply(measure, (str(path), mode))
+                print(
+                    f"  {label}  加载 {load * 1000:9.2f} ms"
+                    f"  首帧 {frame * 1000:7.2f} ms"
+                    f"  常驻内存 {rss:8.1f} MB"
+                )
+            path.unlink()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+# benchmark/save.py
+# 存档基准测试：大地图上少量修改的二进制存档（见 core/savefile.py）
+#
+# 用法: python -m benchmark.save [--size 10000] [--edits 5000] [--budget 50]
+#
+# 加载（打开存档 + apply_delta）超过 --budget 毫秒时以状态码 1 退出
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from core import savefile
+from core.crop import CropField
+from core.player import Player
+from core.tile import TILE_DTYPE, set_terrain
+from core.time import GameTime
+from core.world import World
+
+
+def generate_map(path: Path, size: int):
+    """生成 size x size 的空白地图（稀疏文件，不在内存中生成）"""
+    tiles = np.lib.format.open_memmap(
+        path, mode="w+", dtype=TILE_DTYPE, shape=(size, size)
+    )
+    del tiles
+
+
+def edit(world, edits: int, seed: int = 0):
+    """
+    在地图上随机修改 edits 个分散的格子
+    :return: (xs, ys) 修改的坐标
+    """
+    rng = np.random.default_rng(seed)
+    xs = rng.integers(0, world.width, edits)
+    ys = rng.integers(0, world.height, edits)
+    tiles = world.read_cells(xs, ys)
+    tiles["char"] = ord("*")
+    set_terrain(tiles, 2)
+    tiles["rgb"] = rng.integers(0, 256, (edits, 3))
+    world.write_cells(xs, ys, tiles)
+    return xs, ys
+
+
+def main():
+    parser = argparse.ArgumentParser(description="存档基准测试")
+    parser.add_argument("--size", type=int, default=10000, help="地图边长")
+    parser.add_argument("--edits", type=int, default=5000, help="修改的格子数")
+    parser.add_argument(
+        "--budget", type=float, default=50.0, help="加载耗时上限（毫秒）"
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "big.npy"
+        generate_map(path, args.size)
+        full = args.size * args.size * TILE_DTYPE.itemsize
+        print(
+            f"地图 {args.size}x{args.size}（{full / 2**20:.0f} MB），"
+            f"修改 {args.edits} 个格子"
+        )
+
+        world = World(path, mmap_mode="c")
+        delta = savefile.WorldDelta(world)
+        game_time = GameTime()
+        crops = CropField(world)
+        xs, ys = edit(world, args.edits)
+
+        start = time.perf_counter()
+        state = savefile.snapshot(world, delta, Player(x=1, y=1), game_time, crops)
+        copied = time.perf_counter() - start
+        start = time.perf_counter()
+        data = savefile.encode(state)
+        encoded = time.perf_counter() - start
+        print(f"  snapshot      {copied * 1000:9.2f} ms  （持有 player_lock 的部分）")
+        print(f"  encode        {encoded * 1000:9.2f} ms  （后台线程）")
+        print(f"  存档大小      {len(data) / 1024:9.1f} KB")
+
+        save_path = Path(tmp) / "save.tfs"
+        save_path.write_bytes(data)
+        loaded = World(path, mmap_mode="c")
+        start = time.perf_counter()
+        save = savefile.SaveFile(save_path)
+        opened = time.perf_counter() - start
+        start = time.perf_counter()
+        cells = save.apply_delta(loaded)
+        applied = time.perf_counter() - start
+        same = bool(
+            (
+                loaded.read_cells(xs, ys).view(np.uint64)
+                == world.read_cells(xs, ys).view(np.uint64)
+            ).all()
+        )
+        print(
+            f"  打开存档      {opened * 1000:9.2f} ms  "
+            f"（有修改的区块 {len(save.delta_chunks)}）"
+        )
+        print(
+            f"  apply_delta   {applied * 1000:9.2f} ms  "
+            f"（{cells} 个格子）  结果一致: {same}"
+        )
+        load = (opened + applied) * 1000
+        ok = same and load <= args.budget
+        print(
+            f"  加载合计      {load:9.2f} ms  "
+            f"（上限 {args.budget:g} ms）  {'通过' if ok else '未通过'}"
+        )
+        if not ok:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
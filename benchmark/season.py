@@ -0,0 +1,89 @@
+# benchmark/season.py
+# 批量推进基准测试：一整个季节（4 x 30 天）的作物与事件模拟
+#
+# 用法: python -m benchmark.season [--size 2000] [--field 600] [--days 120] [--compare]
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from core.crop import CropField, SPECIES
+from core.tile import new_tiles, save_tiles, set_terrain
+from core.time import DAY_MINUTES, GameTime
+from core.world import World
+
+
+def generate_farm(path: Path, size: int, field: int):
+    """生成 size x size 的地图，左上角 field x field 为田地"""
+    tiles = new_tiles(size, size)
+    set_terrain(tiles, 1)
+    set_terrain(tiles[:field, :field], 2)
+    save_tiles(path, tiles)
+
+
+def setup(path: Path, field: int, seed: int = 0):
+    """
+    加载地图，在全部田地上种满作物，并安排每 3 天一次的下雨事件
+    :return: (game_time, crops)
+    """
+    world = World(path, mmap_mode="c")
+    game_time = GameTime()
+    crops = CropField(world)
+    game_time.add_system(crops)
+
+    rng = np.random.default_rng(seed)
+    ys, xs = np.mgrid[:field, :field]
+    crops.plant_many(xs.ravel(), ys.ravel(), rng.integers(0, len(SPECIES), xs.size))
+    crops.water_all()
+    game_time.scheduler.schedule_in(
+        3 * DAY_MINUTES, crops.water_all, every=3 * DAY_MINUTES
+    )
+    return game_time, crops
+
+
+def main():
+    parser = argparse.ArgumentParser(description="批量推进基准测试")
+    parser.add_argument("--size", type=int, default=2000, help="地图边长")
+    parser.add_argument("--field", type=int, default=600, help="田地边长")
+    parser.add_argument("--days", type=int, default=120, help="推进天数")
+    parser.add_argument(
+        "--compare", action="store_true", help="同时运行逐分钟 tick 并核对结果"
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "farm.npy"
+        generate_farm(path, args.size, args.field)
+        print(
+            f"地图 {args.size}x{args.size}，作物 {args.field * args.field}，"
+            f"推进 {args.days} 天"
+        )
+
+        game_time, crops = setup(path, args.field)
+        start = time.perf_counter()
+        game_time.advance_days(args.days)
+        bulk = time.perf_counter() - start
+        print(f"  advance_days  {bulk * 1000:9.2f} ms")
+
+        if args.compare:
+            ref_time, ref_crops = setup(path, args.field)
+            start = time.perf_counter()
+            for _ in range(args.days * DAY_MINUTES):
+                ref_time.tick(minutes=1)
+            ticks = time.perf_counter() - start
+            n = crops.count
+            same = ref_time.to_dict() == game_time.to_dict() and all(
+                (getattr(ref_crops, name)[:n] == getattr(crops, name)[:n]).all()
+                for name in ("index", "stage", "water_left", "age")
+            )
+            print(
+                f"  逐分钟 tick    {ticks * 1000:9.2f} ms"
+                f"  ({ticks / bulk:.0f}x)  结果一致: {same}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,490 @@
+# core/chunk.py
+# 分块世界地图
+
+import json
+import queue
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+
+from core.tile import TILE_DTYPE, WALKABLE, load_tiles, new_tiles, save_tiles
+from core.world import World
+
+"""
+[分块地图]
+超大地图按固定大小切分为多个区块 (chunk)，每个区块是一个独立的 .npy 文件，
+只有玩家附近的区块常驻内存。
+
+目录结构：
+    map/<name>/
+        meta.json          {"version", "width", "height", "chunk_size"}
+        <cy>_<cx>.npy      区块 (chunk_size, chunk_size)，紧凑格式，见 core/tile.py
+
+不存在的区块视为空白区块。
+
+游戏中地图目录保持不变（与普通地图的写时复制映射相同）：修改过的区块换出时写入
+临时的覆盖层目录 (overlay)，读取时优先读取覆盖层，关闭地图时删除覆盖层。
+修改由存档保存（core/savefile.py，以地图目录为基础地图比较）。
+只有 writeback=True（地图编辑、转换）时才写回地图目录。
+
+普通地图可以使用 `python -m core.chunk map/farm.npy map/farm` 转换为分块地图。
+"""
+
+CHUNK_VERSION = 1
+
+
+class ChunkStore:
+    """
+    区块存储
+    - 按需从磁盘加载区块，LRU 缓存常驻区块
+    - 修改过的区块（脏区块）在换出或 flush 时写入覆盖层（没有覆盖层时写回地图目录）
+    - 后台线程预取区块
+    """
+
+    def __init__(
+        self, path: str | Path, cache_size: int = 256, overlay: str | Path | None = None
+    ):
+        """
+        :param path: 分块地图目录
+        :param cache_size: 最多常驻内存的区块数
+        :param overlay: 可选，覆盖层目录，脏区块写入这里，地图目录不修改
+        """
+        self.path = Path(path)
+        self.overlay = Path(overlay) if overlay is not None else None
+        meta_file = self.path / "meta.json"
+        if not meta_file.exists():
+            raise FileNotFoundError(f"分块地图不存在: {self.path}")
+
+        meta = json.loads(meta_file.read_text(encoding="utf-8"))
+        if meta.get("version") != CHUNK_VERSION:
+            raise ValueError(f"不支持的分块地图版本: {meta.get('version')}")
+
+        self.width = meta["width"]
+        self.height = meta["height"]
+        self.chunk_size = meta["chunk_size"]
+        self.cache_size = cache_size
+
+        # 常驻区块 {(cy, cx): tiles}，按最近使用排序
+        self.cache = OrderedDict()
+        self.dirty = set()
+        self.lock = threading.RLock()
+
+        # 颜色量化器与常驻区块的颜色代码 {(cy, cx): codes}，见 World.quantize
+        self.quantizer = None
+        self.codes = {}
+
+        # 预取线程
+        self.prefetch_queue = queue.Queue()
+        self.thread = threading.Thread(target=self._prefetch_loop, daemon=True)
+        self.thread.start()
+
+    @classmethod
+    def create(cls, path: str | Path, width: int, height: int, chunk_size: int = 64):
+        """创建空白分块地图"""
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        meta = {
+            "version": CHUNK_VERSION,
+            "width": width,
+            "height": height,
+            "chunk_size": chunk_size,
+        }
+        (path / "meta.json").write_text(json.dumps(meta, indent=4), encoding="utf-8")
+        return cls(path)
+
+    @classmethod
+    def from_tiles(cls, path: str | Path, tiles, chunk_size: int = 64):
+        """
+        将普通地图切分为分块地图
+        :param tiles: (h, w) 紧凑格式数组（可以是内存映射）
+        """
+        height, width = tiles.shape
+        store = cls.create(path, width, height, chunk_size)
+        for cy in range(store.rows):
+            for cx in range(store.cols):
+                chunk = new_tiles(chunk_size, chunk_size)
+                block = tiles[
+                    cy * chunk_size : (cy + 1) * chunk_size,
+                    cx * chunk_size : (cx + 1) * chunk_size,
+                ]
+                chunk[: block.shape[0], : block.shape[1]] = block
+                save_tiles(store.chunk_path(cy, cx), chunk)
+        return store
+
+    @property
+    def rows(self):
+        """区块行数"""
+        return -(-self.height // self.chunk_size)
+
+    @property
+    def cols(self):
+        """区块列数"""
+        return -(-self.width // self.chunk_size)
+
+    def chunk_path(self, cy: int, cx: int) -> Path:
+        """区块文件路径"""
+        return self.path / f"{cy}_{cx}.npy"
+
+    def _read(self, cy: int, cx: int):
+        """从磁盘读取区块（优先读取覆盖层），不存在则返回空白区块"""
+        if self.overlay is not None:
+            f = self.overlay / self.chunk_path(cy, cx).name
+            if f.exists():
+                return load_tiles(f)
+        return self.read_base(cy, cx)
+
+    def read_base(self, cy: int, cx: int):
+        """从地图目录读取区块（不含覆盖层中的修改），不存在则返回空白区块"""
+        f = self.chunk_path(cy, cx)
+        if f.exists():
+            return load_tiles(f)
+        return new_tiles(self.chunk_size, self.chunk_size)
+
+    def _write(self, key, chunk):
+        """脏区块写入覆盖层，没有覆盖层时写回地图目录"""
+        if self.overlay is not None:
+            save_tiles(self.overlay / self.chunk_path(*key).name, chunk)
+        else:
+            save_tiles(self.chunk_path(*key), chunk)
+
+    def _insert(self, key, chunk):
+        """放入缓存并换出最久未使用的区块（需持有锁）"""
+        self.cache[key] = chunk
+        if self.quantizer is not None:
+            self.codes[key] = self.quantizer.quantize_tiles(chunk)
+        while len(self.cache) > self.cache_size:
+            old_key, old_chunk = self.cache.popitem(last=False)
+            self.codes.pop(old_key, None)
+            if old_key in self.dirty:
+                self._write(old_key, old_chunk)
+                self.dirty.discard(old_key)
+
+    def get(self, cy: int, cx: int):
+        """
+        获取区块（必要时从磁盘加载）
+        :return: (chunk_size, chunk_size) 紧凑格式数组
+        """
+        key = (cy, cx)
+        with self.lock:
+            chunk = self.cache.get(key)
+            if chunk is not None:
+                self.cache.move_to_end(key)
+                return chunk
+
+        # 磁盘读取不占用锁，其他线程可以继续访问已缓存的区块
+        chunk = self._read(cy, cx)
+        with self.lock:
+            # 读取期间可能已被预取线程放入
+            if key in self.cache:
+                self.cache.move_to_end(key)
+                return self.cache[key]
+            self._insert(key, chunk)
+        return chunk
+
+    def write(self, cy: int, cx: int, index, tiles):
+        """
+        修改区块的一部分并标记为脏区块
+        :param index: 区块内的切片
+        :param tiles: 写入的格子
+        """
+        # 持锁完成读取、修改和标记，避免修改中途被换出而丢失
+        with self.lock:
+            chunk = self.get(cy, cx)
+            chunk[index] = tiles
+            self.dirty.add((cy, cx))
+            codes = self.codes.get((cy, cx))
+            if codes is not None:
+                codes[index] = self.quantizer.quantize_tiles(chunk[index])
+
+    def get_codes(self, cy: int, cx: int):
+        """
+        获取区块的颜色代码（区块加载时已量化）
+        :return: (chunk_size, chunk_size) int16 数组
+        """
+        with self.lock:
+            chunk = self.get(cy, cx)
+            codes = self.codes.get((cy, cx))
+            if codes is None:
+                codes = self.quantizer.quantize_tiles(chunk)
+                self.codes[(cy, cx)] = codes
+            return codes
+
+    def set_quantizer(self, quantizer):
+        """设置颜色量化器，已常驻的区块立即量化，之后加载的区块在加载时量化"""
+        with self.lock:
+            self.quantizer = quantizer
+            self.codes = {}
+            if quantizer is not None:
+                for key, chunk in self.cache.items():
+                    self.codes[key] = quantizer.quantize_tiles(chunk)
+
+    def prefetch(self, keys):
+        """
+        请求后台预取区块
+        :param keys: 可迭代的 (cy, cx)
+        """
+        for cy, cx in keys:
+            if 0 <= cy < self.rows and 0 <= cx < self.cols:
+                # 其他线程可能同时调整缓存顺序或换出，与 get 相同持锁判断
+                with self.lock:
+                    cached = (cy, cx) in self.cache
+                if not cached:
+                    self.prefetch_queue.put((cy, cx))
+
+    def _prefetch_loop(self):
+        """预取线程主循环"""
+        while True:
+            key = self.prefetch_queue.get()
+            if key is None:
+                break
+            with self.lock:
+                cached = key in self.cache
+            if cached:
+                continue
+            chunk = self._read(*key)
+            with self.lock:
+                # 视口内的区块每帧都会被访问，换出的是玩家身后的区块
+                if key not in self.cache:
+                    self._insert(key, chunk)
+
+    def flush(self):
+        """写回全部脏区块（写入覆盖层或地图目录，见 _write）"""
+        with self.lock:
+            for key in self.dirty:
+                self._write(key, self.cache[key])
+            self.dirty.clear()
+
+    def close(self):
+        """停止预取线程并写回"""
+        self.prefetch_queue.put(None)
+        self.thread.join()
+        self.flush()
+
+
+class ChunkedWorld(World):
+    """
+    分块地图系统
+    - 与 World 接口相同：is_walkable / get_tile / get_zone / get_view
+    - 根据玩家移动方向在后台预取前方区块
+    - 默认不修改地图目录：修改写入临时覆盖层，关闭时删除（与 World 的 "c" 映射相同）
+    """
+
+    def __init__(self, map_path: str, cache_size: int = 256, writeback: bool = False):
+        """
+        初始化分块地图
+        :param map_path: 分块地图目录
+        :param cache_size: 最多常驻内存的区块数
+        :param writeback: 是否把修改写回地图目录（地图编辑），默认写入临时覆盖层
+        """
+        # 临时覆盖层目录，close 时删除
+        self.overlay = None if writeback else tempfile.TemporaryDirectory()
+        self.store = ChunkStore(
+            map_path,
+            cache_size=cache_size,
+            overlay=self.overlay.name if self.overlay else None,
+        )
+        self.tiles = None  # 没有完整的地图数组
+        self.height, self.width = self.store.height, self.store.width
+        self.name = Path(map_path).name
+        self.path = Path(map_path)
+
+        # 上一次视口中心，用于判断移动方向
+        self.last_center = None
+
+        # 颜色量化器（颜色代码由 ChunkStore 按区块保存）
+        self.quantizer = None
+
+        # 地图修改监听器 callback(x, y, w, h)，格子修改监听器见 add_cell_listener
+        self.listeners = []
+        self.cell_listeners = []
+
+    def is_walkable(self, x: int, y: int) -> bool:
+        """判断坐标是否可通行"""
+        if 0 <= x < self.width and 0 <= y < self.height:
+            cs = self.store.chunk_size
+            chunk = self.store.get(y // cs, x // cs)
+            return bool(chunk["flags"][y % cs, x % cs] & WALKABLE)
+        return False
+
+    def is_walkable_many(self, xs, ys):
+        """
+        批量判断坐标是否可通行（按区块分组查询）
+        :return: bool 数组，越界坐标为 False
+        """
+        xs, ys = np.broadcast_arrays(np.asarray(xs), np.asarray(ys))
+        result = np.zeros(xs.shape, dtype=bool)
+        inside = (xs >= 0) & (xs < self.width) & (ys >= 0) & (ys < self.height)
+        xs, ys = xs[inside], ys[inside]
+
+        walkable = np.zeros(xs.shape, dtype=bool)
+        for cy, cx, sel, index in self._cells(xs, ys):
+            chunk = self.store.get(cy, cx)
+            walkable[sel] = chunk["flags"][index] & WALKABLE
+        result[inside] = walkable
+        return result
+
+    def _cells(self, xs, ys):
+        """
+        按区块分组分散的坐标（坐标须在地图范围内）
+        :return: 生成 (cy, cx, 属于该区块的坐标掩码, 区块内索引)
+        """
+        cs, cols = self.store.chunk_size, self.store.cols
+        keys = (ys // cs) * cols + xs // cs
+        for key in np.unique(keys).tolist():
+            sel = keys == key
+            cy, cx = divmod(key, cols)
+            yield cy, cx, sel, (ys[sel] % cs, xs[sel] % cs)
+
+    def read_cells(self, xs, ys):
+        """读取多个分散的格子（按区块分组）"""
+        xs, ys = np.asarray(xs), np.asarray(ys)
+        out = np.empty(xs.shape, dtype=TILE_DTYPE)
+        for cy, cx, sel, index in self._cells(xs, ys):
+            out[sel] = self.store.get(cy, cx)[index]
+        return out
+
+    def write_cells(self, xs, ys, tiles):
+        """写入多个分散的格子，涉及的区块标记为脏"""
+        xs, ys = np.asarray(xs), np.asarray(ys)
+        if not xs.size:
+            return
+        for cy, cx, sel, index in self._cells(xs, ys):
+            self.store.write(cy, cx, index, tiles[sel])
+        x0, y0 = int(xs.min()), int(ys.min())
+        self.notify(
+            x0, y0, int(xs.max()) - x0 + 1, int(ys.max()) - y0 + 1, cells=(xs, ys)
+        )
+
+    def get_tile(self, x: int, y: int):
+        """获取单个格子数据（结构化记录，字段 char/flags/rgb）"""
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            return None
+        cs = self.store.chunk_size
+        return self.store.get(y // cs, x // cs)[y % cs, x % cs]
+
+    def _blocks(self, top: int, left: int, bottom: int, right: int):
+        """
+        遍历矩形区域覆盖的区块
+        :return: 生成 (cy, cx, 区块内切片, 区域内切片)
+        """
+        cs = self.store.chunk_size
+        for cy in range(top // cs, (bottom - 1) // cs + 1):
+            y0, y1 = max(top, cy * cs), min(bottom, (cy + 1) * cs)
+            for cx in range(left // cs, (right - 1) // cs + 1):
+                x0, x1 = max(left, cx * cs), min(right, (cx + 1) * cs)
+                inner = (
+                    slice(y0 - cy * cs, y1 - cy * cs),
+                    slice(x0 - cx * cs, x1 - cx * cs),
+                )
+                outer = (slice(y0 - top, y1 - top), slice(x0 - left, x1 - left))
+                yield cy, cx, inner, outer
+
+    def read_region(self, top: int, left: int, bottom: int, right: int):
+        """
+        读取矩形区域 [top:bottom, left:right] 的格子
+        :return: 由各区块拼接的新数组
+        """
+        out = np.empty((bottom - top, right - left), dtype=TILE_DTYPE)
+        for cy, cx, inner, outer in self._blocks(top, left, bottom, right):
+            out[outer] = self.store.get(cy, cx)[inner]
+        return out
+
+    def write_tiles(self, x: int, y: int, tiles):
+        """
+        以 (x, y) 为左上角写入一块格子，涉及的区块标记为脏
+        :param tiles: (h, w) 紧凑格式数组
+        """
+        h, w = tiles.shape
+        for cy, cx, inner, outer in self._blocks(y, x, y + h, x + w):
+            self.store.write(cy, cx, inner, tiles[outer])
+        self.notify(x, y, w, h)
+
+    def read_base(self, xs, ys):
+        """
+        读取地图目录中区块文件的多个格子（不含缓存与覆盖层中的修改），用于与当前地图比较
+        """
+        xs, ys = np.asarray(xs), np.asarray(ys)
+        out = np.empty(xs.shape, dtype=TILE_DTYPE)
+        for cy, cx, sel, index in self._cells(xs, ys):
+            out[sel] = self.store.read_base(cy, cx)[index]
+        return out
+
+    def quantize(self, quantizer):
+        """按终端颜色深度量化地图颜色，区块在加载（包括后台预取）时量化"""
+        if quantizer is not None and quantizer.depth == "truecolor":
+            quantizer = None
+        self.quantizer = quantizer
+        self.store.set_quantizer(quantizer)
+
+    def read_codes(self, top: int, left: int, bottom: int, right: int):
+        """
+        读取矩形区域的颜色代码
+        :return: 由各区块拼接的 int16 数组，未量化时返回 None
+        """
+        if self.quantizer is None:
+            return None
+        out = np.empty((bottom - top, right - left), dtype=np.int16)
+        for cy, cx, inner, outer in self._blocks(top, left, bottom, right):
+            out[outer] = self.store.get_codes(cy, cx)[inner]
+        return out
+
+    def get_view(
+        self, center_x: int, center_y: int, view_w: int, view_h: int, cursor_pos=None
+    ):
+        """获取视口，并预取移动方向前方的区块"""
+        view = super().get_view(center_x, center_y, view_w, view_h, cursor_pos)
+
+        if self.last_center is not None:
+            dx = np.sign(center_x - self.last_center[0])
+            dy = np.sign(center_y - self.last_center[1])
+            if dx or dy:
+                self._prefetch_ahead(view, int(dx), int(dy))
+        self.last_center = (center_x, center_y)
+        return view
+
+    def _prefetch_ahead(self, view, dx: int, dy: int):
+        """预取视口在 (dx, dy) 方向外侧一圈的区块"""
+        cs = self.store.chunk_size
+        h, w = view.shape
+        cy0, cy1 = view.top // cs, (view.top + h - 1) // cs
+        cx0, cx1 = view.left // cs, (view.left + w - 1) // cs
+
+        keys = []
+        if dx:
+            cx = cx1 + 1 if dx > 0 else cx0 - 1
+            keys += [(cy, cx) for cy in range(cy0, cy1 + 1)]
+        if dy:
+            cy = cy1 + 1 if dy > 0 else cy0 - 1
+            keys += [(cy, cx) for cx in range(cx0, cx1 + 1)]
+        if dx and dy:
+            keys.append((cy, cx))
+        self.store.prefetch(keys)
+
+    def flush(self):
+        """写回全部修改过的区块（写入覆盖层，writeback 时写回地图目录）"""
+        self.store.flush()
+
+    def close(self):
+        """关闭地图，停止预取并写回，删除临时覆盖层"""
+        self.store.close()
+        if self.overlay is not None:
+            self.overlay.cleanup()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="普通地图转换为分块地图")
+    parser.add_argument("map_path", help="普通地图文件，例如 map/farm.npy")
+    parser.add_argument("out_dir", help="分块地图目录，例如 map/farm")
+    parser.add_argument("-s", "--chunk-size", type=int, default=64, help="区块边长")
+    args = parser.parse_args()
+
+    store = ChunkStore.from_tiles(
+        args.out_dir, load_tiles(args.map_path, mmap_mode="r"), args.chunk_size
+    )
+    store.close()
+    print(f"已转换为 {store.rows}x{store.cols} 个区块: {args.out_dir}")
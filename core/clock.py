@@ -0,0 +1,133 @@
+# core/clock.py
+# 模拟时钟
+
+import math
+import time
+
+"""
+[模拟时钟]
+按固定步长推进游戏时间：现实时间累积到累加器中，每满一个步长推进 1 游戏分钟。
+- 使用单调时钟，系统时间调整不影响游戏
+- 线程被延迟时，下次更新补上错过的分钟（每次最多 max_steps 步，避免卡住渲染）
+- 积压超过 max_backlog 步时丢弃更早的部分，长时间停顿（例如挂起）后不会快进
+- 速度倍率：pause / 1x / 10x / max（max 每次更新推进 max_steps 步）
+"""
+
+# 速度倍率 {名称: 倍率}
+SPEEDS = {"pause": 0, "1x": 1, "10x": 10, "max": math.inf}
+
+
+class SimulationClock:
+    """
+    固定步长模拟时钟
+    - update：根据经过的现实时间推进 GameTime，返回推进的分钟数
+    - set_speed / cycle_speed / toggle_pause：调整速度
+    """
+
+    def __init__(
+        self,
+        game_time,
+        step: float = 1.0,
+        speed: str = "1x",
+        max_steps: int = 60,
+        max_backlog: int = 600,
+        clock=time.monotonic,
+    ):
+        """
+        :param game_time: GameTime 对象
+        :param step: 1x 速度下每游戏分钟对应的现实秒数
+        :param speed: 初始速度 pause / 1x / 10x / max
+        :param max_steps: 每次更新最多推进的分钟数
+        :param max_backlog: 最多积压的分钟数，超出部分丢弃
+        :param clock: 现实时间函数（秒），默认 time.monotonic
+        """
+        self.game_time = game_time
+        self.step = step
+        self.max_steps = max_steps
+        self.max_backlog = max_backlog
+        self.clock = clock
+
+        # 累加器：尚未推进的现实时间（已乘以速度倍率）
+        self.accumulator = 0.0
+        self.last = clock()
+        # 丢弃的分钟数（统计用）
+        self.dropped = 0
+
+        self.speed = "1x"
+        # 暂停前的速度，恢复时使用
+        self.resume = "1x"
+        self.set_speed(speed)
+
+    @property
+    def multiplier(self):
+        """当前速度倍率"""
+        return SPEEDS[self.speed]
+
+    @property
+    def paused(self):
+        """是否暂停"""
+        return self.speed == "pause"
+
+    def set_speed(self, speed: str):
+        """设置速度"""
+        if speed not in SPEEDS:
+            raise ValueError(f"不支持的速度: {speed}")
+        # 切换速度前先结算已经过的时间，按旧速度计入
+        self.update()
+        self.speed = speed
+        if speed != "pause":
+            self.resume = speed
+
+    def toggle_pause(self):
+        """暂停 / 恢复到暂停前的速度"""
+        self.set_speed(self.resume if self.paused else "pause")
+
+    def cycle_speed(self, direction: int = 1):
+        """
+        切换到下一档（direction=1）或上一档（direction=-1）速度，不包括暂停
+        """
+        names = [name for name in SPEEDS if name != "pause"]
+        current = names.index(self.resume)
+        self.set_speed(names[max(0, min(len(names) - 1, current + direction))])
+
+    def update(self) -> int:
+        """
+        根据经过的现实时间推进游戏时间
+        :return: 推进的游戏分钟数
+        """
+        now = self.clock()
+        elapsed, self.last = now - self.last, now
+
+        multiplier = self.multiplier
+        if multiplier == 0:
+            self.accumulator = 0.0
+            return 0
+
+        if math.isinf(multiplier):
+            steps = self.max_steps
+        else:
+            self.accumulator += elapsed * multiplier
+            backlog = self.accumulator / self.step
+            if backlog > self.max_backlog:
+                self.dropped += int(backlog - self.max_backlog)
+                self.accumulator = self.max_backlog * self.step
+            steps = min(int(self.accumulator / self.step), self.max_steps)
+            self.accumulator -= steps * self.step
+
+        # 逐分钟推进，跨越午夜 / 新的一天的逻辑与原来相同
+        for _ in range(steps):
+            self.game_time.tick(minutes=1)
+        return steps
+
+    def time_until_next(self) -> float:
+        """
+        距离下一步还需要的现实秒数
+        :return: 秒；暂停时为 math.inf，max 速度或有积压时为 0
+        """
+        multiplier = self.multiplier
+        if multiplier == 0:
+            return math.inf
+        if math.isinf(multiplier):
+            return 0.0
+        pending = self.accumulator + (self.clock() - self.last) * multiplier
+        return max(0.0, (self.step - pending) / multiplier)
@@ -1,10 +1,25 @@
 # core/control.py
 # 控制器
 
-import queue
+import os
+import selectors
+import sys
 import threading
+import time
 from blessed import Terminal
 
+"""
+[输入]
+输入线程阻塞等待 stdin 可读（selectors），不再按超时轮询；停止时通过管道唤醒。
+读取到的按键转为动作放入待执行列表，并立即唤醒等待的消费者（take）。
+
+同一方向的连续移动合并为一项：按住方向键时终端的自动重复可能比游戏处理更快，
+消费者每帧取走一次，期间到达的同向移动合并为 ("move", dx, dy)，最多 move_cap 格，
+超出部分丢弃（dropped 计数），松开按键后不会继续移动。
+不同方向的移动不合并，按按下的顺序分别执行（遇到障碍时结果与逐个执行相同）。
+每个动作附带最早一次按键的读取时间，用于统计输入到执行的延迟。
+"""
+
 
 class Control:
     """
@@ -12,10 +27,16 @@ class Control:
     支持：
     - 方向键移动
     - P 暂停/恢复
+    - [ ] 减慢/加快游戏时间
     - Ctrl+W 保存
     - Ctrl+X 退出
+    - F3 性能分析叠加显示
+    - take：取走全部待执行动作（连续移动已合并）
     """
 
+    # 同向连续移动合并后最多的格数
+    MOVE_CAP = 3
+
     # 定义方向键对应的移动向量 (dx, dy)
     MOVE_KEYS = {
         "KEY_UP": (0, -1),
@@ -24,6 +45,17 @@ class Control:
         "KEY_RIGHT": (1, 0),
     }
 
+    # 游戏时间速度调整
+    SPEED_KEYS = {
+        "[": -1,
+        "]": 1,
+    }
+
+    # 功能键
+    FUNCTION_KEYS = {
+        "KEY_F3": "profile",
+    }
+
     # 定义 Ctrl 快捷键
     CTRL_KEYS = {
         "\x17": "save",  # Ctrl+W
@@ -31,65 +63,174 @@ class Control:
     }
 
     # 初始化控制器
-    def __init__(self, term=None):
+    def __init__(self, term=None, threaded=True, move_cap=MOVE_CAP, recorder=None):
+        """
+        :param term: blessed.Terminal 对象
+        :param threaded: 是否启动输入线程；asyncio 运行时由事件循环读取按键，
+            通过 push 放入动作
+        :param move_cap: 同向连续移动合并后最多的格数（至少 1）
+        :param recorder: 可选，core.replay.Recorder，录制读取到的每个按键
+        """
+        if move_cap < 1:
+            raise ValueError(f"move_cap 必须至少为 1: {move_cap}")
         self.term = term if term else Terminal()
-        # 存储动作的队列
-        self.action_queue = queue.Queue()
+        self.move_cap = move_cap
+        self.recorder = recorder
+        # 待执行的动作 [(按键, 动作, 读取时间)]，同向连续移动合并为一项
+        self.pending = []
+        self.cond = threading.Condition()
+        # 超出 move_cap 被丢弃的移动次数
+        self.dropped = 0
         # 控制输入线程是否运行
-        self.running = True
-        # 启动输入线程（守护线程，程序退出时自动结束）
-        self.thread = threading.Thread(target=self._input_loop, daemon=True)
-        self.thread.start()
+        self.running = threaded
+        self.thread = None
+        # 停止时唤醒输入线程的管道
+        self.wake_r = self.wake_w = None
+        if threaded:
+            self.wake_r, self.wake_w = os.pipe()
+            # 启动输入线程（守护线程，程序退出时自动结束）
+            self.thread = threading.Thread(target=self._input_loop, daemon=True)
+            self.thread.start()
 
-    def _input_loop(self):
+    def resolve(self, key):
         """
-        输入线程主循环（非阻塞）
-        - 使用 blessed 的 cbreak 模式读取按键
-        - 将检测到的动作放入队列
+        按键转为动作
+        :param key: blessed 按键
+        :return: tuple 动作，例如 ("move", 1, 0) 或 ("save",)，无对应动作返回 None
         """
-        with self.term.cbreak(), self.term.hidden_cursor():
-            while self.running:
-                # 非阻塞读取键盘输入，超时 0.05 秒
-                key = self.term.inkey(timeout=0.05)
-                if not key:
-                    # 没有输入则继续循环
-                    continue
+        # 方向键
+        if key.name in self.MOVE_KEYS:
+            dx, dy = self.MOVE_KEYS[key.name]
+            return ("move", dx, dy)
+
+        # Ctrl 快捷键
+        if key in self.CTRL_KEYS:
+            return (self.CTRL_KEYS[key],)
 
-                # 初始化动作为空
-                action = None
+        # 功能键
+        if key.name in self.FUNCTION_KEYS:
+            return (self.FUNCTION_KEYS[key.name],)
 
-                # 方向键
-                if key.name in self.MOVE_KEYS:
-                    dx, dy = self.MOVE_KEYS[key.name]
-                    action = ("move", dx, dy)
+        # P 暂停/恢复时间
+        if key.upper() == "P":
+            return ("pause",)
 
-                # Ctrl 快捷键
-                elif key in self.CTRL_KEYS:
-                    action = (self.CTRL_KEYS[key],)
+        # [ ] 调整时间速度
+        if key in self.SPEED_KEYS:
+            return ("speed", self.SPEED_KEYS[key])
 
-                # P 暂停/恢复时间
-                elif key.upper() == "P":
-                    action = ("pause",)
+        return None
 
-                # 将动作放入队列（可能为空）
-                self.action_queue.put((key, action))
+    def push(self, key, stamp: float | None = None):
+        """
+        按键转为动作放入待执行列表，并唤醒消费者
+        与上一项同向的移动合并（见 add）
+        :param key: blessed 按键
+        :param stamp: 读取时间 time.perf_counter()，默认为当前时间
+        :return: 按键对应的动作（可能为 None）
+        """
+        if stamp is None:
+            stamp = time.perf_counter()
+        action = self.resolve(key)
+        if self.recorder:
+            self.recorder.record(key, action, stamp)
+        self.add(key, action, stamp)
+        return action
 
-    def get_action(self):
+    def add(self, key, action, stamp: float):
         """
-        获取队列中的最新动作
-        :return: tuple 动作信息，例如 ("move", 1, 0) 或 ("save",)，没有动作返回 None
+        放入已解析的动作（回放时直接使用录制的动作），见 push
         """
+        with self.cond:
+            last = self.pending[-1] if self.pending else None
+            if self._same_direction(last and last[1], action):
+                # 合并同向移动，保留最早的读取时间，超出 move_cap 的丢弃
+                _, dx, dy = last[1]
+                if max(abs(dx), abs(dy)) < self.move_cap:
+                    dx, dy = dx + action[1], dy + action[2]
+                else:
+                    self.dropped += 1
+                self.pending[-1] = (key, ("move", dx, dy), last[2])
+            else:
+                self.pending.append((key, action, stamp))
+            self.cond.notify_all()
+
+    @staticmethod
+    def _same_direction(last, action) -> bool:
+        """上一项动作 last 与单格移动 action 是否为同一方向的移动"""
+        if not (last and action and last[0] == "move" and action[0] == "move"):
+            return False
+        _, dx, dy = last
+        return ((dx > 0) - (dx < 0), (dy > 0) - (dy < 0)) == action[1:]
+
+    def take(self, timeout: float | None = 0):
+        """
+        取走全部待执行动作
+        :param timeout: 没有动作时最长等待秒数，0 不等待，None 一直等待
+        :return: list [(按键, 动作, 读取时间)]，动作例如 ("move", 2, 0) 或 ("save",)，
+            读取时间为该动作最早一次按键的 time.perf_counter()
+        """
+        with self.cond:
+            if not self.pending and timeout != 0:
+                self.cond.wait(timeout)
+            items, self.pending = self.pending, []
+        return items
+
+    @staticmethod
+    def keyboard_fd(term):
+        """
+        读取按键的文件描述符（blessed 从 stdin 读取按键）
+        :return: stdin 的文件描述符，终端不是 tty 或 stdin 不可用时返回 None
+        """
+        if not term.is_a_tty:
+            return None
         try:
-            return self.action_queue.get_nowait()
-        except queue.Empty:
+            fd = sys.stdin.fileno()
+        except (AttributeError, OSError, ValueError):
             return None
+        return fd if os.isatty(fd) else None
+
+    def _input_loop(self):
+        """
+        输入线程主循环
+        - 使用 blessed 的 cbreak 模式读取按键
+        - 阻塞等待 stdin 可读，然后读取全部已到达的按键
+        """
+        fd = self.keyboard_fd(self.term)
+        with self.term.cbreak(), self.term.hidden_cursor():
+            if fd is None:
+                # stdin 不是终端（或不支持 selectors 的平台），按超时轮询
+                while self.running:
+                    key = self.term.inkey(timeout=0.05)
+                    if key:
+                        self.push(key)
+                return
+
+            with selectors.DefaultSelector() as selector:
+                selector.register(fd, selectors.EVENT_READ)
+                selector.register(self.wake_r, selectors.EVENT_READ)
+                while self.running:
+                    events = selector.select()
+                    if any(k.fd == self.wake_r for k, _ in events):
+                        break
+                    # blessed 会缓冲一次读到的多个按键，读到没有为止
+                    stamp = time.perf_counter()
+                    key = self.term.inkey(timeout=0)
+                    while key:
+                        self.push(key, stamp)
+                        key = self.term.inkey(timeout=0)
 
     def stop(self):
         """
         停止输入线程
         """
         self.running = False
-        self.thread.join()  # 等待线程退出
+        if self.thread:
+            os.write(self.wake_w, b"\0")  # 唤醒阻塞的 select
+            self.thread.join()  # 等待线程退出
+            os.close(self.wake_r)
+            os.close(self.wake_w)
+            self.thread = None
 
 
 if __name__ == "__main__":
@@ -109,29 +250,30 @@ if __name__ == "__main__":
 
     try:
         with term.cbreak(), term.hidden_cursor():
-            while True:
-                key, action = None, None
-                # 阻塞直到有按键
-                item = control.action_queue.get()
-                if item:
-                    key, action = item
-
-                # 获取按键名
-                key_name = KEY_SEQ_MAP.get(
-                    str(key), key.upper() if len(key) == 1 else "UNKNOWN"
-                )
-
-                # 构造显示内容
-                display = f"按下键: {key_name}"
-                if action:
-                    display += f", 对应动作: {action}"
-
-                # 实时刷新显示，不换行
-                print(term.move_xy(0, 2) + term.clear_eol + display, end="", flush=True)
-
-                # Ctrl+X退出
-                if action and action[0] == "quit":
-                    break
+            action = None
+            while not (action and action[0] == "quit"):
+                # 阻塞直到有按键（连续的移动已合并）
+                for key, action, _ in control.take(timeout=None):
+                    # 获取按键名
+                    key_name = KEY_SEQ_MAP.get(
+                        str(key), key.upper() if len(key) == 1 else "UNKNOWN"
+                    )
+
+                    # 构造显示内容
+                    display = f"按下键: {key_name}"
+                    if action:
+                        display += f", 对应动作: {action}"
+
+                    # 实时刷新显示，不换行
+                    print(
+                        term.move_xy(0, 2) + term.clear_eol + display,
+                        end="",
+                        flush=True,
+                    )
+
+                    # Ctrl+X退出
+                    if action and action[0] == "quit":
+                        break
 
     finally:
         control.stop()
@@ -0,0 +1,334 @@
+# core/crop.py
+# 作物
+
+import struct
+
+import numpy as np
+
+from core.tile import TRANSPARENT, terrain
+
+"""
+[作物系统]
+作物只能种在田地（地形类型 2）上。全部作物以"数组结构"保存，
+每个属性一个 numpy 数组，第 i 个元素属于同一株作物：
+
+字段      类型      说明
+index    int64    所在格子的展平坐标 y * width + x
+species  uint8    作物种类，SPECIES 的下标
+stage    uint8    生长阶段，0 为种子，最后一个阶段为成熟
+water    uint8    剩余水分（天），每天消耗 1，为 0 时不生长
+age      uint16   已生长天数（只计算有水分的日子）
+
+每个游戏日 (GameTime.new_day) 对全部作物做一次向量化计算：
+    生长 = water > 0
+    age += 生长，water -= 生长
+    stage = age 达到的阶段阈值个数
+阶段变化的格子在 changed 中给出，并写回地图（字符与颜色），
+渲染器只需重绘这些格子。
+"""
+
+# 田地地形类型
+FIELD = 2
+
+# 浇水一次保持的天数
+WATER_DAYS = 2
+
+# 存档中的作物字段及其类型（小端），见 CropField.pack
+STATE_FIELDS = (
+    ("index", "<i8"),
+    ("species_id", "u1"),
+    ("stage", "u1"),
+    ("water_left", "u1"),
+    ("age", "<u2"),
+)
+
+# 收获或移除作物后田地的字符与颜色
+SOIL_CHAR = "."
+SOIL_COLOR = (120, 90, 60)
+
+# 作物种类
+# days: 进入下一阶段所需天数；chars / colors: 每个阶段的字符与颜色（比 days 多一个成熟阶段）
+SPECIES = [
+    {
+        "name": "turnip",
+        "days": (1, 2, 2),
+        "chars": ",;vT",
+        "colors": [(150, 120, 70), (120, 200, 90), (90, 180, 60), (230, 230, 230)],
+    },
+    {
+        "name": "potato",
+        "days": (1, 3, 3, 3),
+        "chars": ",;vwP",
+        "colors": [
+            (150, 120, 70),
+            (120, 200, 90),
+            (90, 180, 60),
+            (70, 160, 50),
+            (200, 160, 90),
+        ],
+    },
+    {
+        "name": "strawberry",
+        "days": (1, 2, 3, 2),
+        "chars": ",;v*S",
+        "colors": [
+            (150, 120, 70),
+            (120, 200, 90),
+            (90, 180, 60),
+            (240, 240, 240),
+            (230, 40, 60),
+        ],
+    },
+]
+
+
+def build_tables(species):
+    """
+    由作物种类生成查找表，按 species 下标向量化查询
+    :return: (stages, chars, colors)
+        stages: (n, d + 1) 生长天数对应的阶段，d 为最长的成熟天数，超过 d 天按 d 查询
+        chars: (n, s + 1) 每个阶段的字符编码
+        colors: (n, s + 1, 3) 每个阶段的颜色
+    """
+    longest = max(sum(sp["days"]) for sp in species)
+    most = max(len(sp["days"]) for sp in species)
+    stages = np.zeros((len(species), longest + 1), dtype=np.uint8)
+    chars = np.zeros((len(species), most + 1), dtype=np.uint32)
+    colors = np.zeros((len(species), most + 1, 3), dtype=np.uint8)
+    for i, sp in enumerate(species):
+        n = len(sp["days"])
+        # 阶段 = 已达到的累计天数阈值个数
+        thresholds = np.cumsum(sp["days"])
+        stages[i] = np.searchsorted(thresholds, np.arange(longest + 1), side="right")
+        chars[i, : n + 1] = [ord(c) for c in sp["chars"]]
+        colors[i, : n + 1] = sp["colors"]
+    return stages, chars, colors
+
+
+class CropField:
+    """
+    作物田
+    - plant / water / harvest：单株操作（玩家动作）
+    - water_all：全部浇水（例如下雨）
+    - new_day：每个游戏日向量化推进全部作物，由 GameTime 调用（见 GameTime.add_system）
+    - changed：上一次推进中生长阶段发生变化的格子坐标 (xs, ys)
+    - pack / unpack：存档（见 core/savefile.py）
+    """
+
+    def __init__(self, world, species=SPECIES, capacity: int = 1024):
+        """
+        :param world: World 或 ChunkedWorld 对象，作物字符写入地图
+        :param species: 作物种类列表
+        :param capacity: 初始数组容量，种植超出时自动扩大
+        """
+        self.world = world
+        self.species = species
+        self.stages, self.chars, self.colors = build_tables(species)
+        # 每种作物的成熟阶段
+        self.mature = np.array([len(sp["days"]) for sp in species], dtype=np.uint8)
+
+        # 作物数据（只有前 count 个有效）
+        self.count = 0
+        self.index = np.zeros(capacity, dtype=np.int64)
+        self.species_id = np.zeros(capacity, dtype=np.uint8)
+        self.stage = np.zeros(capacity, dtype=np.uint8)
+        self.water_left = np.zeros(capacity, dtype=np.uint8)
+        self.age = np.zeros(capacity, dtype=np.uint16)
+
+        # 格子到数组下标 {index: i}，单株操作使用
+        self.slots = {}
+
+        self.changed = (np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64))
+
+    def __len__(self):
+        return self.count
+
+    def _grow(self):
+        """数组容量翻倍"""
+        for name in ("index", "species_id", "stage", "water_left", "age"):
+            old = getattr(self, name)
+            new = np.zeros(len(old) * 2, dtype=old.dtype)
+            new[: len(old)] = old
+            setattr(self, name, new)
+
+    def plant(self, x: int, y: int, species: int) -> bool:
+        """
+        在 (x, y) 种植作物
+        :param species: 作物种类（SPECIES 下标）
+        :return: bool，不是田地或已有作物时返回 False
+        """
+        return self.plant_many([x], [y], species) == 1
+
+    def plant_many(self, xs, ys, species) -> int:
+        """
+        批量种植作物，不是田地或已有作物的格子跳过
+        :param xs: 横坐标数组
+        :param ys: 纵坐标数组
+        :param species: 作物种类，单个值或与 xs 形状相同的数组
+        :return: 种下的作物数
+        """
+        xs, ys = np.asarray(xs, dtype=np.int64), np.asarray(ys, dtype=np.int64)
+        species = np.broadcast_to(np.asarray(species), xs.shape)
+        if ((species < 0) | (species >= len(self.species))).any():
+            raise ValueError(f"不存在的作物种类: {species}")
+
+        inside = (xs >= 0) & (xs < self.world.width)
+        inside &= (ys >= 0) & (ys < self.world.height)
+        xs, ys, species = xs[inside], ys[inside], species[inside]
+        field = terrain(self.world.read_cells(xs, ys)) == FIELD
+        keys, first = np.unique(ys * self.world.width + xs, return_index=True)
+        keep = [
+            i for key, i in zip(keys.tolist(), first.tolist()) if key not in self.slots
+        ]
+        keep = np.array(keep, dtype=np.int64)
+        keep = keep[field[keep]] if keep.size else keep
+        keys = ys[keep] * self.world.width + xs[keep]
+
+        n = len(keys)
+        while self.count + n > len(self.index):
+            self._grow()
+        new = np.arange(self.count, self.count + n)
+        self.index[new] = keys
+        self.species_id[new] = species[keep]
+        self.stage[new] = 0
+        self.water_left[new] = 0
+        self.age[new] = 0
+        self.slots.update(zip(keys.tolist(), new.tolist()))
+        self.count += n
+        self.paint(new)
+        return n
+
+    def water(self, x: int, y: int, days: int = WATER_DAYS) -> bool:
+        """
+        给 (x, y) 的作物浇水
+        :return: bool，没有作物时返回 False
+        """
+        i = self.slots.get(y * self.world.width + x)
+        if i is None:
+            return False
+        self.water_left[i] = max(int(self.water_left[i]), min(days, 255))
+        return True
+
+    def water_all(self, days: int = WATER_DAYS):
+        """全部作物浇水（例如下雨）"""
+        water = self.water_left[: self.count]
+        np.maximum(water, min(days, 255), out=water)
+
+    def harvest(self, x: int, y: int):
+        """
+        收获 (x, y) 的成熟作物
+        :return: 作物种类下标，没有成熟作物返回 None
+        """
+        key = y * self.world.width + x
+        i = self.slots.get(key)
+        if i is None or self.stage[i] < self.mature[self.species_id[i]]:
+            return None
+        species = int(self.species_id[i])
+        self.remove(x, y)
+        return species
+
+    def remove(self, x: int, y: int) -> bool:
+        """
+        移除 (x, y) 的作物，格子恢复为田地
+        :return: bool，没有作物时返回 False
+        """
+        key = y * self.world.width + x
+        i = self.slots.pop(key, None)
+        if i is None:
+            return False
+
+        # 最后一株作物移到空出的位置
+        last = self.count - 1
+        if i != last:
+            for name in ("index", "species_id", "stage", "water_left", "age"):
+                array = getattr(self, name)
+                array[i] = array[last]
+            self.slots[int(self.index[i])] = i
+        self.count -= 1
+
+        tile = self.world.read_cells([x], [y])
+        tile["char"] = ord(SOIL_CHAR)
+        tile["rgb"] = SOIL_COLOR
+        tile["flags"] &= ~TRANSPARENT & 0xFF
+        self.world.write_cells([x], [y], tile)
+        return True
+
+    def grow(self, days: int = 1):
+        """
+        全部作物生长 days 天（向量化，与逐日推进结果相同）
+        有水分的作物每天生长一天、消耗一天水分，水分用完后停止生长
+        :return: 阶段发生变化的作物下标数组
+        """
+        n = self.count
+        water = self.water_left[:n]
+        grown = np.minimum(water, min(days, 255)).astype(np.uint16)
+        water -= grown.astype(np.uint8)
+        age = self.age[:n]
+        age[...] = np.minimum(age.astype(np.int64) + grown, np.iinfo(np.uint16).max)
+
+        longest = self.stages.shape[1] - 1
+        stage = self.stages[self.species_id[:n], np.minimum(age, longest)]
+        changed = np.flatnonzero(stage != self.stage[:n])
+        self.stage[:n] = stage
+        return changed
+
+    def new_day(self, game_time=None):
+        """新的一天：全部作物生长一天，并重绘阶段变化的格子"""
+        self.advance_days(1)
+
+    def advance_days(self, days: int, game_time=None):
+        """
+        批量推进 days 天（GameTime.advance 调用），结果与逐日推进相同，
+        只重绘最终阶段与推进前不同的格子
+        """
+        self.paint(self.grow(days))
+
+    def paint(self, slots):
+        """
+        将作物当前阶段的字符与颜色写入地图
+        :param slots: 作物下标数组
+        """
+        width = self.world.width
+        ys, xs = np.divmod(self.index[slots], width)
+        self.changed = (xs, ys)
+        if not len(slots):
+            return
+
+        species, stage = self.species_id[slots], self.stage[slots]
+        tiles = self.world.read_cells(xs, ys)
+        tiles["char"] = self.chars[species, stage]
+        tiles["rgb"] = self.colors[species, stage]
+        tiles["flags"] &= ~TRANSPARENT & 0xFF
+        self.world.write_cells(xs, ys, tiles)
+
+    def paint_all(self):
+        """重绘全部作物（加载存档后使用）"""
+        self.paint(np.arange(self.count))
+
+    def pack(self) -> bytes:
+        """
+        全部作物打包为字节串：作物数 (uint32)，然后按 STATE_FIELDS 依次为各字段数组
+        """
+        n = self.count
+        parts = [struct.pack("<I", n)]
+        for name, dtype in STATE_FIELDS:
+            parts.append(getattr(self, name)[:n].astype(dtype).tobytes())
+        return b"".join(parts)
+
+    def unpack(self, data: bytes):
+        """
+        从 pack 的结果恢复全部作物（不重绘地图，地图格子由存档的地图修改恢复）
+        :param data: pack 返回的字节串
+        """
+        (n,) = struct.unpack_from("<I", data)
+        offset = struct.calcsize("<I")
+        while n > len(self.index):
+            self._grow()
+        for name, dtype in STATE_FIELDS:
+            values = np.frombuffer(data, dtype=dtype, count=n, offset=offset)
+            offset += values.nbytes
+            getattr(self, name)[:n] = values
+        if (self.species_id[:n] >= len(self.species)).any():
+            raise ValueError("存档中有不存在的作物种类")
+        self.count = n
+        self.slots = dict(zip(self.index[:n].tolist(), range(n)))
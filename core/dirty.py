@@ -0,0 +1,68 @@
+# core/dirty.py
+# 帧失效标记
+
+import asyncio
+import threading
+
+
+class DirtyFlag:
+    """
+    帧失效标记（事件驱动渲染）
+    - 玩家移动、时间推进、地图修改、终端大小改变等状态变化时调用 mark
+    - 渲染循环调用 wait 休眠，直到有变化才绘制下一帧
+    - asyncio 运行时先调用 attach，然后使用 wait_async
+    """
+
+    def __init__(self):
+        self.cond = threading.Condition()
+        # 自上一帧以来的变化原因
+        self.reasons = set()
+        # asyncio 事件循环与事件（attach 后使用）
+        self.loop = None
+        self.event = None
+
+    def attach(self, loop):
+        """
+        关联 asyncio 事件循环，之后 mark 也会唤醒 wait_async
+        :param loop: asyncio 事件循环
+        """
+        self.loop = loop
+        self.event = asyncio.Event()
+        if self.reasons:
+            self.event.set()
+
+    def mark(self, reason: str = "any"):
+        """
+        标记需要重绘，并唤醒渲染循环
+        :param reason: 变化原因，例如 "player" / "time" / "world" / "resize"
+        """
+        with self.cond:
+            self.reasons.add(reason)
+            self.cond.notify_all()
+        if self.loop is not None:
+            # 可以在其他线程或信号处理函数中调用
+            self.loop.call_soon_threadsafe(self.event.set)
+
+    def wait(self, timeout: float | None = None) -> set:
+        """
+        等待直到有变化或超时
+        :param timeout: 最长等待秒数，None 表示一直等待
+        :return: 变化原因集合（超时返回空集合），返回后标记被清空
+        """
+        with self.cond:
+            if not self.reasons:
+                self.cond.wait(timeout)
+            reasons, self.reasons = self.reasons, set()
+        return reasons
+
+    async def wait_async(self, timeout: float | None = None) -> set:
+        """wait 的协程版本（需要先 attach）"""
+        if not self.reasons:
+            try:
+                await asyncio.wait_for(self.event.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        self.event.clear()
+        with self.cond:
+            reasons, self.reasons = self.reasons, set()
+        return reasons
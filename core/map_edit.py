@@ -1,10 +1,33 @@
 # core/map_edit.py
 # 地图编辑器
 
-import numpy as np
 from pathlib import Path
 from blessed import Terminal
 
+try:
+    from core.tile import (
+        TRANSPARENT,
+        WALKABLE,
+        load_tiles,
+        new_tiles,
+        save_tiles,
+        set_color,
+        set_terrain,
+        terrain,
+    )
+except ImportError:
+    # 作为独立组件运行时 (python core/map_edit.py)
+    from tile import (
+        TRANSPARENT,
+        WALKABLE,
+        load_tiles,
+        new_tiles,
+        save_tiles,
+        set_color,
+        set_terrain,
+        terrain,
+    )
+
 
 class Map:
     def __init__(self):
@@ -18,20 +41,20 @@ class Map:
         self.width = width
         self.height = height
         self.name = name
-        self.tiles = np.empty((height, width, 6), dtype=int)
-
-        self.tiles[:, :, 0] = ord(" ")  # 字符，存为 Unicode 整数
-        self.tiles[:, :, 1] = 1  # 可通行
-        self.tiles[:, :, 2] = 1  # 地形
-        self.tiles[:, :, 3:6] = -1  # 颜色
-
-        # 设置地图边缘和对应值
-        edges = [(0, ord("#")), (1, 0), (3, 150), (4, 150), (5, 150)]
-        for channel, value in edges:
-            self.tiles[0, :, channel] = value
-            self.tiles[-1, :, channel] = value
-            self.tiles[:, 0, channel] = value
-            self.tiles[:, -1, channel] = value
+        # 空格、可通行、透明（紧凑格式，见 core/tile.py）
+        self.tiles = new_tiles(height, width)
+        set_terrain(self.tiles, 1)  # 地形
+
+        # 设置地图边缘：'#'、不可通行、灰色
+        for edge in (
+            self.tiles[0, :],
+            self.tiles[-1, :],
+            self.tiles[:, 0],
+            self.tiles[:, -1],
+        ):
+            edge["char"] = ord("#")
+            edge["flags"] &= ~WALKABLE & 0xFF
+            set_color(edge, (150, 150, 150))
 
         print(f"地图 {self.name} 初始化完成")
 
@@ -39,15 +62,19 @@ class Map:
         """保存地图"""
         f = Path(path)
         f.parent.mkdir(parents=True, exist_ok=True)  # 创建目录
-        np.save(f, self.tiles)
+        save_tiles(f, self.tiles)
         print(f"地图已保存到 {f}")
 
-    def load_map(self, path: str):
-        """加载地图"""
+    def load_map(self, path: str, mmap_mode: str | None = "c"):
+        """
+        加载地图
+        :param mmap_mode: 默认 "c" 写时复制映射，修改只在保存时写入文件；
+            "r+" 修改直接写回文件；None 一次性读入内存
+        """
         f = Path(path)
         if not f.exists():
             raise FileNotFoundError(f"地图文件不存在: {f}")
-        self.tiles = np.load(f, allow_pickle=True)
+        self.tiles = load_tiles(f, mmap_mode=mmap_mode)  # 旧格式自动转换
         self.height, self.width = self.tiles.shape[:2]
         self.name = f.stem
         print(f"地图 {self.name} 已加载")
@@ -167,8 +194,9 @@ class Map:
 
         # 一次性裁剪出视口区域
         view = self.tiles[top : top + view_h, left : left + view_w]
-        view_chars = view[:, :, 0].astype(int)
-        view_colors = view[:, :, 3:6].astype(int)
+        view_chars = view["char"]
+        view_colors = view["rgb"]
+        view_opaque = (view["flags"] & TRANSPARENT) == 0
 
         for y in range(view_chars.shape[0]):
             row_str = ""
@@ -180,16 +208,18 @@ class Map:
                     char = term.red + "@"
                 # 显示彩色
                 elif color:
-                    r, g, b = view_colors[y, x]
-                    if r != -1 and g != -1 and b != -1:
+                    if view_opaque[y, x]:
+                        r, g, b = view_colors[y, x]
                         char = term.color_rgb(r, g, b)(char)
                 row_str += char
             print(row_str)
 
         # 显示光标所在格信息
         tile = self.tiles[cursor_y, cursor_x]
-        C, P, T = tile[0], tile[1], tile[2]
-        R, G, B = tile[3], tile[4], tile[5]
+        C, P, T = tile["char"], tile["flags"] & WALKABLE, terrain(tile)
+        R, G, B = tile["rgb"]
+        if tile["flags"] & TRANSPARENT:
+            R, G, B = -1, -1, -1
 
         print(f"\n位置: ({cursor_x}, {cursor_y})")
         print(f"字符: [{C}] ({R},{G},{B}) ", end="")
@@ -299,10 +329,10 @@ class Map:
                     if char:
                         if region_start and region_end:
                             ys, xs = self.get_zone(region_start, region_end)
-                            self.tiles[ys, xs, 0] = ord(char)  # 批量修改
+                            self.tiles["char"][ys, xs] = ord(char)  # 批量修改
                         else:
                             # 单格修改
-                            self.tiles[cursor_y, cursor_x, 0] = ord(char)
+                            self.tiles["char"][cursor_y, cursor_x] = ord(char)
 
                 # 修改颜色
                 elif key.upper() == "R":
@@ -319,17 +349,22 @@ class Map:
                     # 批量修改区域或单格
                     if region_start and region_end:
                         ys, xs = self.get_zone(region_start, region_end)
-                        self.tiles[ys, xs, 3:6] = [r, g, b]
                     else:
-                        self.tiles[cursor_y, cursor_x, 3:6] = [r, g, b]
+                        ys, xs = self.get_zone(
+                            (cursor_y, cursor_x), (cursor_y, cursor_x)
+                        )
+                    try:
+                        set_color(self.tiles[ys, xs], (r, g, b))
+                    except ValueError:
+                        pass  # 颜色超出 0-255
 
                 # 切换通行状态
                 elif key.upper() == "P":
                     if region_start and region_end:
                         ys, xs = self.get_zone(region_start, region_end)
-                        self.tiles[ys, xs, 1] ^= 1
+                        self.tiles["flags"][ys, xs] ^= WALKABLE
                     else:
-                        self.tiles[cursor_y, cursor_x, 1] ^= 1
+                        self.tiles["flags"][cursor_y, cursor_x] ^= WALKABLE
 
                 # 修改地形
                 elif key.upper() == "T":
@@ -337,9 +372,14 @@ class Map:
                     if t and t.isdigit():
                         if region_start and region_end:
                             ys, xs = self.get_zone(region_start, region_end)
-                            self.tiles[ys, xs, 2] = int(t)
                         else:
-                            self.tiles[cursor_y, cursor_x, 2] = int(t)
+                            ys, xs = self.get_zone(
+                                (cursor_y, cursor_x), (cursor_y, cursor_x)
+                            )
+                        try:
+                            set_terrain(self.tiles[ys, xs], int(t))
+                        except ValueError:
+                            pass  # 地形类型超出 0-63
 
                 # 显示帮助菜单
                 elif key.upper() == "H":
@@ -378,6 +418,12 @@ if __name__ == "__main__":
     parser.add_argument(
         "--no-color", action="store_false", dest="color", help="禁用彩色显示"
     )
+    parser.add_argument(
+        "--mmap",
+        choices=["c", "r+", "none"],
+        default="c",
+        help="地图加载方式：c 写时复制映射 / r+ 直接写回文件 / none 全部读入内存",
+    )
 
     args = parser.parse_args()
 
@@ -393,7 +439,7 @@ if __name__ == "__main__":
 
     # 地图文件是否存在
     if map_file.exists():
-        editor.load_map(map_file)
+        editor.load_map(map_file, mmap_mode=None if args.mmap == "none" else args.mmap)
     else:
         print(f"地图文件 {map_file} 不存在，将创建新地图 {args.width}x{args.height}")
         editor.init_map(width=args.width, height=args.height, name=map_file.stem)
@@ -0,0 +1,282 @@
+# core/pathfinding.py
+# 寻路
+
+import heapq
+from collections import OrderedDict
+
+import numpy as np
+
+from core.tile import WALKABLE, terrain
+
+"""
+[寻路系统]
+基于 World 的可通行数据，移动方式与玩家相同（上下左右四个方向）。
+
+- find_path：A* 单次寻路，适合点击移动等一次性查询
+- 距离场：从目标（谷仓、水源、田地等）出发做一次广度优先搜索，
+  得到每个格子到最近目标的步数。任意数量的角色共用同一张距离场，
+  每一步只需比较相邻四格，O(1)。
+- 距离场按目标名缓存，地图修改时只有真正受影响的距离场才会失效
+"""
+
+# 上下左右
+DIRECTIONS = ((0, -1), (0, 1), (-1, 0), (1, 0))
+
+# 不可到达
+UNREACHABLE = -1
+
+
+class DistanceField:
+    """
+    距离场
+    - padded: (h + 2, w + 2) 每格到最近目标的步数，不可到达为 -1，四周填充一圈 -1
+    - dist: (h, w) padded 去掉填充的视图
+    - bounds: 覆盖的地图区域 (top, left, bottom, right)
+    """
+
+    def __init__(self, padded, bounds, walk, targets):
+        self.padded = padded
+        self.dist = padded[1:-1, 1:-1]
+        self.bounds = bounds
+        # 生成时的可通行平面与目标平面，用于判断修改是否影响结果
+        self.walk = walk
+        self.targets = targets
+
+    def distance(self, x: int, y: int) -> int:
+        """坐标到最近目标的步数，区域外或不可到达返回 -1"""
+        top, left, bottom, right = self.bounds
+        if top <= y < bottom and left <= x < right:
+            return int(self.dist[y - top, x - left])
+        return UNREACHABLE
+
+    def next_step(self, x: int, y: int):
+        """
+        朝最近目标走一步
+        :return: (dx, dy)；已到达或不可到达返回 None
+        """
+        d = self.distance(x, y)
+        if d <= 0:
+            return None
+        for dx, dy in DIRECTIONS:
+            if self.distance(x + dx, y + dy) == d - 1:
+                return dx, dy
+        return None
+
+    def next_steps(self, xs, ys):
+        """
+        批量计算多个角色的下一步
+        :param xs: 横坐标数组
+        :param ys: 纵坐标数组
+        :return: (dxs, dys)，已到达或不可到达的角色为 (0, 0)
+        """
+        top, left, bottom, right = self.bounds
+        padded = self.padded
+        # 区域外的坐标压到填充格上，相邻格不需要越界判断
+        xs = np.clip(np.asarray(xs) - left + 1, 0, right - left + 1)
+        ys = np.clip(np.asarray(ys) - top + 1, 0, bottom - top + 1)
+
+        here = padded[ys, xs]
+        dxs = np.zeros(xs.shape, dtype=int)
+        dys = np.zeros(ys.shape, dtype=int)
+        found = here <= 0
+        for dx, dy in DIRECTIONS:
+            step = ~found & (padded[ys + dy, xs + dx] == here - 1)
+            dxs[step], dys[step] = dx, dy
+            found |= step
+        return dxs, dys
+
+
+def build_distance(walk, targets):
+    """
+    多源广度优先搜索
+    :param walk: (h, w) bool 可通行平面
+    :param targets: (h, w) bool 目标平面，目标本身可以不可通行（例如水源）
+    :return: (h + 2, w + 2) int32 步数，不可到达为 -1，四周填充一圈 -1
+    """
+    h, w = walk.shape
+    width = w + 2
+
+    # 四周填充一圈不可通行，展平后相邻格为 ±1 / ±width，不会越界
+    passable = np.zeros((h + 2, width), dtype=bool)
+    passable[1:-1, 1:-1] = walk
+    passable = passable.ravel()
+    dist = np.full(passable.shape, UNREACHABLE, dtype=np.int32)
+
+    seeds = np.zeros((h + 2, width), dtype=bool)
+    seeds[1:-1, 1:-1] = targets
+    frontier = np.flatnonzero(seeds)
+    dist[frontier] = 0
+
+    # 逐层扩展，每层一次向量化运算
+    step = 0
+    offsets = np.array([-1, 1, -width, width])
+    while frontier.size:
+        step += 1
+        nb = (frontier[:, None] + offsets).ravel()
+        nb = nb[passable[nb] & (dist[nb] == UNREACHABLE)]
+        frontier = np.unique(nb)
+        dist[frontier] = step
+
+    return dist.reshape(h + 2, width)
+
+
+class Pathfinder:
+    """
+    寻路器
+    - find_path：A* 单次寻路
+    - add_target / add_terrain_target：注册常用目标
+    - field / next_step：使用缓存的距离场移动
+    """
+
+    def __init__(self, world, cache_size: int = 16):
+        """
+        :param world: World 或 ChunkedWorld 对象
+        :param cache_size: 最多缓存的距离场数量
+        """
+        self.world = world
+        self.cache_size = cache_size
+        # 注册的目标 {name: (kind, value, bounds)}
+        self.targets = {}
+        # 距离场缓存 {name: DistanceField}
+        self.fields = OrderedDict()
+        world.add_listener(self.on_world_changed)
+
+    def find_path(self, start, goal, max_nodes: int = 100000):
+        """
+        A* 寻路
+        :param start: 起点 (x, y)
+        :param goal: 终点 (x, y)
+        :param max_nodes: 最多展开的格子数，防止在超大地图上无限搜索
+        :return: 路径 [(x, y), ...]（含起点和终点），找不到返回 None
+        """
+        start, goal = tuple(start), tuple(goal)
+        if not self.world.is_walkable(*goal):
+            return None
+
+        gx, gy = goal
+        came_from = {start: None}
+        cost = {start: 0}
+        # 估值相同时优先展开离起点更远（更接近终点）的格子
+        heap = [(abs(start[0] - gx) + abs(start[1] - gy), 0, start)]
+
+        while heap and len(came_from) <= max_nodes:
+            _, g, node = heapq.heappop(heap)
+            g = -g
+            if node == goal:
+                path = []
+                while node is not None:
+                    path.append(node)
+                    node = came_from[node]
+                return path[::-1]
+            if g > cost[node]:
+                continue  # 已有更短路径
+
+            x, y = node
+            for dx, dy in DIRECTIONS:
+                nxt = (x + dx, y + dy)
+                if nxt in cost and cost[nxt] <= g + 1:
+                    continue
+                if not self.world.is_walkable(*nxt):
+                    continue
+                cost[nxt] = g + 1
+                came_from[nxt] = node
+                h = abs(nxt[0] - gx) + abs(nxt[1] - gy)
+                heapq.heappush(heap, (g + 1 + h, -(g + 1), nxt))
+
+        return None
+
+    def add_target(self, name: str, points, bounds=None):
+        """
+        注册坐标目标（例如谷仓门口、水源）
+        :param name: 目标名称
+        :param points: 坐标列表 [(x, y), ...]
+        :param bounds: 距离场覆盖区域 (top, left, bottom, right)，默认整张地图
+        """
+        self.targets[name] = ("points", list(points), bounds)
+        self.fields.pop(name, None)
+
+    def add_terrain_target(self, name: str, terrain_type: int, bounds=None):
+        """
+        注册地形目标（例如 2=田地）
+        :param name: 目标名称
+        :param terrain_type: 地形类型
+        :param bounds: 距离场覆盖区域 (top, left, bottom, right)，默认整张地图
+        """
+        self.targets[name] = ("terrain", terrain_type, bounds)
+        self.fields.pop(name, None)
+
+    def field(self, name: str) -> DistanceField:
+        """获取目标的距离场（必要时重新计算）"""
+        field = self.fields.get(name)
+        if field is not None:
+            self.fields.move_to_end(name)
+            return field
+
+        kind, value, bounds = self.targets[name]
+        bounds = bounds or (0, 0, self.world.height, self.world.width)
+        top, left, bottom, right = bounds
+        tiles = self.world.read_region(top, left, bottom, right)
+        walk = (tiles["flags"] & WALKABLE) != 0
+
+        if kind == "terrain":
+            targets = terrain(tiles) == value
+        else:
+            targets = np.zeros(walk.shape, dtype=bool)
+            for x, y in value:
+                if top <= y < bottom and left <= x < right:
+                    targets[y - top, x - left] = True
+
+        field = DistanceField(build_distance(walk, targets), bounds, walk, targets)
+        self.fields[name] = field
+        while len(self.fields) > self.cache_size:
+            self.fields.popitem(last=False)
+        return field
+
+    def next_step(self, name: str, x: int, y: int):
+        """
+        朝目标走一步
+        :return: (dx, dy)；已到达或不可到达返回 None
+        """
+        return self.field(name).next_step(x, y)
+
+    def on_world_changed(self, x: int, y: int, w: int, h: int):
+        """
+        地图修改时检查缓存的距离场
+        只有可通行状态或目标确实变化、并且变化的格子与可到达区域相连时才失效
+        """
+        for name in list(self.fields):
+            field = self.fields[name]
+            top, left, bottom, right = field.bounds
+            y0, y1 = max(y, top), min(y + h, bottom)
+            x0, x1 = max(x, left), min(x + w, right)
+            if y0 >= y1 or x0 >= x1:
+                continue
+
+            tiles = self.world.read_region(y0, x0, y1, x1)
+            walk = (tiles["flags"] & WALKABLE) != 0
+            region = (slice(y0 - top, y1 - top), slice(x0 - left, x1 - left))
+
+            # 地形目标变化
+            kind, value, _ = self.targets[name]
+            if (
+                kind == "terrain"
+                and ((terrain(tiles) == value) != field.targets[region]).any()
+            ):
+                del self.fields[name]
+                continue
+
+            changed = walk != field.walk[region]
+            if not changed.any():
+                continue
+
+            # 变为不可通行的格子原本可到达，或变为可通行的格子与可到达区域相邻
+            ys, xs = np.nonzero(changed)
+            ys, xs = ys + region[0].start + 1, xs + region[1].start + 1
+            near = field.padded[ys, xs] >= 0
+            for dx, dy in DIRECTIONS:
+                near |= field.padded[ys + dy, xs + dx] >= 0
+            if near.any():
+                del self.fields[name]
+            else:
+                # 与距离场无关的修改，只更新记录的可通行平面
+                field.walk[region] = walk
@@ -31,3 +31,22 @@ class Player:
 
         # 不可通行时不移动
         return False
+
+    def walk(self, dx, dy, world):
+        """
+        逐格移动（合并后的同向多格移动），遇到不可通行的格子停在其前方
+        :param dx: 横向格数
+        :param dy: 纵向格数
+        :param world: World 对象
+        :return: bool，至少移动了一格返回 True
+        """
+        moved = False
+        for step, count in (
+            ((1 if dx > 0 else -1, 0), abs(dx)),
+            ((0, 1 if dy > 0 else -1), abs(dy)),
+        ):
+            for _ in range(count):
+                if not self.move(*step, world):
+                    break
+                moved = True
+        return moved
@@ -0,0 +1,132 @@
+# core/profiler.py
+# 帧性能分析
+
+import json
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+"""
+[性能分析]
+按阶段记录耗时，统计最近 window 个样本的 p50 / p95 / p99：
+
+阶段        说明
+frame      整帧耗时（超过帧预算计为掉帧）
+viewport   视口提取（get_view + compose）
+diff       滚动与双缓冲比较
+escape     生成转义序列
+write      写入终端
+lock       渲染线程获取游戏状态（读取快照，不等待 player_lock）
+input      按键从读取到执行的延迟
+tick       时间线程推进游戏时间
+save       后台保存存档（序列化、写入与 fsync）
+
+可以在游戏中切换叠加显示，也可以导出为 JSON lines（每帧一行，单位毫秒）。
+"""
+
+# 叠加显示的阶段顺序
+STAGES = (
+    "frame",
+    "viewport",
+    "diff",
+    "escape",
+    "write",
+    "lock",
+    "input",
+    "tick",
+    "save",
+)
+
+
+class FrameProfiler:
+    """
+    帧性能分析器
+    - record：记录某个阶段的一次耗时（任意线程）
+    - end_frame：一帧结束时调用，统计掉帧并导出
+    - overlay_lines：叠加显示的文本
+    """
+
+    def __init__(self, budget: float, window: int = 600, log_path=None):
+        """
+        :param budget: 帧预算（秒），通常为 1 / fps
+        :param window: 每个阶段保留的样本数
+        :param log_path: 可选，JSON lines 导出文件路径
+        """
+        self.budget = budget
+        self.window = window
+        # 各阶段最近的耗时样本（秒）{stage: deque}
+        self.samples = {}
+        # 自上一帧以来其他线程记录的样本，随下一帧一起导出
+        self.pending = {}
+        self.lock = threading.Lock()
+
+        self.frames = 0
+        self.dropped = 0
+        # 是否显示叠加信息
+        self.overlay = False
+
+        self.log = open(log_path, "a", encoding="utf-8") if log_path else None
+
+    def record(self, stage: str, seconds: float):
+        """记录一次阶段耗时"""
+        with self.lock:
+            samples = self.samples.get(stage)
+            if samples is None:
+                samples = self.samples[stage] = deque(maxlen=self.window)
+            samples.append(seconds)
+            self.pending.setdefault(stage, []).append(seconds)
+
+    def end_frame(self, total: float, stages=None):
+        """
+        一帧结束
+        :param total: 整帧耗时（秒）
+        :param stages: 可选，本帧各阶段耗时 {stage: 秒}，例如 renderer.stage_times
+        """
+        for stage, seconds in (stages or {}).items():
+            self.record(stage, seconds)
+        self.record("frame", total)
+
+        with self.lock:
+            self.frames += 1
+            dropped = total > self.budget
+            self.dropped += dropped
+            pending, self.pending = self.pending, {}
+
+        if self.log:
+            line = {"index": self.frames, "t": time.time(), "dropped": dropped}
+            for stage, values in pending.items():
+                line[stage] = round(sum(values) * 1000, 4)
+            self.log.write(json.dumps(line) + "\n")
+
+    def stats(self, stage: str):
+        """
+        阶段耗时统计
+        :return: (p50, p95, p99) 毫秒，没有样本返回 None
+        """
+        with self.lock:
+            samples = self.samples.get(stage)
+            if not samples:
+                return None
+            values = np.array(samples)
+        return tuple(np.percentile(values, (50, 95, 99)) * 1000)
+
+    def overlay_lines(self):
+        """叠加显示的文本，每个阶段一行"""
+        lines = [
+            f"[profile] frames {self.frames}  dropped {self.dropped}"
+            f"  budget {self.budget * 1000:.1f} ms   p50 / p95 / p99 (ms)"
+        ]
+        for stage in STAGES:
+            stats = self.stats(stage)
+            if stats:
+                p50, p95, p99 = stats
+                lines.append(f"  {stage:9s}{p50:8.3f}{p95:8.3f}{p99:8.3f}")
+        return lines
+
+    def close(self):
+        """关闭导出文件"""
+        if self.log:
+            self.log.close()
+            self.log = None
@@ -0,0 +1,200 @@
+# core/replay.py
+# 输入录制与回放
+
+import base64
+import copy
+import json
+import threading
+import time
+from pathlib import Path
+
+from core.control import Control
+from core.save import SaveData
+from core.savefile import SaveFile
+
+"""
+[录制与回放]
+录制文件为 JSON lines，每行一个对象：
+
+第一行   {"type": "header", "version": 1, "save": 存档数据, "savefile": 二进制存档,
+          "speed": "1x", "move_cap": 3}
+按键     {"t": 秒, "key": 按键, "name": 按键名, "action": 动作}
+最后一行 {"type": "end", "t": 秒}
+
+t 为距录制开始的秒数，action 为 Control.resolve 的结果（列表形式，无动作为 null）。
+二进制存档（core/savefile.py）为 base64 文本，开始时没有加载二进制存档则为 null。
+
+回放时用虚拟时钟 ReplayClock 代替 time.monotonic 驱动模拟时钟，按帧推进：
+每帧虚拟时间增加 1 / fps 秒，先推进游戏时间，再执行到期的按键，然后渲染。
+结果只取决于录制内容，与回放速度无关，每次回放完全一致：
+- 实时回放：每帧等到对应的现实时间
+- 快速回放：不等待，用于测量帧耗时与吞吐量（配合 --headless 固定终端大小）
+"""
+
+# 录制文件格式版本
+REPLAY_VERSION = 1
+
+
+class Recorder:
+    """
+    按键录制
+    - record：Control 读取到按键时调用（见 Control 的 recorder 参数）
+    - close：写入结束时间并关闭文件
+    """
+
+    def __init__(self, path: str | Path, save_data: SaveData, save_file=None, **meta):
+        """
+        :param path: 录制文件路径
+        :param save_data: 开始时的存档数据，回放时从这里开始
+        :param save_file: 可选，开始时加载的二进制存档 (SaveFile)
+        :param meta: 其他影响回放的参数，例如 speed / move_cap
+        """
+        self.file = open(path, "w", encoding="utf-8")
+        self.lock = threading.Lock()
+        self.start = time.perf_counter()
+        self._write(
+            {
+                "type": "header",
+                "version": REPLAY_VERSION,
+                "save": copy.deepcopy(save_data.data),
+                "savefile": (
+                    base64.b64encode(save_file.to_bytes()).decode("ascii")
+                    if save_file
+                    else None
+                ),
+                **meta,
+            }
+        )
+
+    def _write(self, record: dict):
+        with self.lock:
+            self.file.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def record(self, key, action, stamp: float):
+        """
+        记录一个按键
+        :param key: blessed 按键
+        :param action: 按键对应的动作，可能为 None
+        :param stamp: 读取时间 time.perf_counter()
+        """
+        self._write(
+            {
+                "t": round(stamp - self.start, 6),
+                "key": str(key),
+                "name": getattr(key, "name", None),
+                "action": list(action) if action else None,
+            }
+        )
+
+    def close(self):
+        """写入结束时间，关闭文件"""
+        if self.file.closed:
+            return
+        self._write({"type": "end", "t": round(time.perf_counter() - self.start, 6)})
+        self.file.close()
+
+
+class Replay:
+    """
+    录制文件内容
+    - header: 文件头（存档数据与参数）
+    - events: [(t, key, action)]，按时间排序
+    - duration: 录制时长（秒）
+    """
+
+    def __init__(self, header: dict, events: list, duration: float):
+        self.header = header
+        self.events = events
+        self.duration = duration
+
+    @classmethod
+    def load(cls, path: str | Path):
+        """
+        读取录制文件
+        :return: Replay 实例
+        """
+        header, events, duration = None, [], None
+        with Path(path).open("r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                kind = record.get("type")
+                if kind == "header":
+                    header = record
+                elif kind == "end":
+                    duration = record["t"]
+                else:
+                    action = record["action"]
+                    events.append(
+                        (record["t"], record["key"], tuple(action) if action else None)
+                    )
+
+        if header is None or header.get("version") != REPLAY_VERSION:
+            raise ValueError(f"不支持的录制文件: {path}")
+        events.sort(key=lambda event: event[0])
+        if duration is None:
+            # 录制没有正常结束，回放到最后一个按键
+            duration = events[-1][0] if events else 0.0
+        return cls(header, events, duration)
+
+    @property
+    def save_data(self) -> SaveData:
+        """录制开始时的存档数据"""
+        return SaveData(copy.deepcopy(self.header["save"]))
+
+    @property
+    def save_file(self):
+        """录制开始时的二进制存档 (SaveFile)，没有返回 None"""
+        data = self.header.get("savefile")
+        return SaveFile(data=base64.b64decode(data)) if data else None
+
+
+class ReplayClock:
+    """虚拟时钟（秒），代替 time.monotonic 传给 SimulationClock"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class ReplayControl(Control):
+    """
+    回放控制器：不读取终端，按虚拟时间放入录制的动作
+    连续移动的合并与实时输入相同（见 Control.add）
+    """
+
+    def __init__(self, replay: Replay, term=None):
+        """
+        :param replay: Replay 对象
+        :param term: blessed.Terminal 对象
+        """
+        super().__init__(
+            term=term,
+            threaded=False,
+            move_cap=replay.header.get("move_cap", Control.MOVE_CAP),
+        )
+        self.events = replay.events
+        self.duration = replay.duration
+        # 下一个要放入的按键
+        self.position = 0
+
+    @property
+    def finished(self) -> bool:
+        """全部按键是否已放入"""
+        return self.position >= len(self.events)
+
+    def feed(self, now: float) -> int:
+        """
+        放入虚拟时间 now 之前（含）的全部按键
+        :return: 放入的按键数
+        """
+        start = self.position
+        stamp = time.perf_counter()
+        while not self.finished and self.events[self.position][0] <= now:
+            _, key, action = self.events[self.position]
+            self.add(key, action, stamp)
+            self.position += 1
+        return self.position - start
@@ -2,9 +2,186 @@
 # 存档管理模块
 # 提供游戏存档的加载、保存及访问接口
 
+import copy
 import json
+import os
+import tempfile
+import threading
+import time
 from pathlib import Path
 
+"""
+[存档写入]
+存档先写入同目录下的临时文件，fsync 后用 os.replace 原子替换，
+写入过程中崩溃只会留下临时文件，原存档保持完整。
+
+游戏中保存使用 save_async：调用方（持有 player_lock）只复制一份存档数据，
+序列化与写入在后台线程 SaveWriter 中完成，不阻塞输入与渲染。
+其他存档文件（例如 core/savefile.py 二进制存档）通过 write_async 提交，
+由同一个后台线程编码与写入。
+同一文件在后台线程还没开始写入时再次保存，只保留最新的一份（coalesced 计数）。
+每次写入的耗时与大小记录在 SaveWriter 中，poll 取得全部写入完成后的结果。
+"""
+
+
+# 进程的 umask（导入时读取一次：os.umask 只能通过设置来读取，不能在写入线程中调用）
+UMASK = os.umask(0)
+os.umask(UMASK)
+
+
+def to_json(data) -> str:
+    """存档数据序列化为 JSON 文本"""
+    return json.dumps(data, ensure_ascii=False, indent=4)
+
+
+def write_atomic(path: str | Path, data: str | bytes) -> int:
+    """
+    原子写入文件：临时文件 + fsync + os.replace
+    mkstemp 创建的临时文件权限为 0600，替换前改为原文件的权限（新文件按 umask）
+    :param path: 目标文件路径
+    :param data: 文件内容，文本按 UTF-8 编码
+    :return: 写入的字节数
+    """
+    path = Path(path)
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    try:
+        mode = path.stat().st_mode & 0o777
+    except FileNotFoundError:
+        mode = 0o666 & ~UMASK
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=path.name, suffix=".tmp")
+    try:
+        os.chmod(tmp, mode)
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+    # 目录项也写入磁盘（不支持打开目录的平台跳过）
+    if hasattr(os, "O_DIRECTORY"):
+        dir_fd = os.open(path.parent, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+    return len(data)
+
+
+class SaveWriter:
+    """
+    后台存档线程
+    - submit：提交一份存档数据，同一文件尚未写入的旧提交被替换
+    - poll：全部提交写入完成后的结果
+    - flush / close：等待写入完成 / 并停止线程
+    统计：saves 写入次数、coalesced 被合并的提交数、
+    last_duration 最近一次写入耗时（秒）、last_size 最近一次写入字节数
+    """
+
+    def __init__(self):
+        self.cond = threading.Condition()
+        # 等待写入的 {路径: (数据, 编码函数)}，按提交顺序写入
+        self.pending = {}
+        # 是否正在写入
+        self.busy = False
+        self.running = True
+        self.thread = None
+
+        self.saves = 0
+        self.coalesced = 0
+        self.last_duration = 0.0
+        self.last_size = 0
+        # 已完成、尚未 poll 的写入合计 [耗时, 字节数, 异常]
+        self.result = None
+
+    def submit(self, path: str | Path, data, encode=to_json):
+        """
+        提交存档数据（调用方不再修改 data）
+        :param path: 存档文件路径
+        :param data: 存档数据
+        :param encode: 在后台线程把 data 转为文件内容 (str 或 bytes) 的函数
+        """
+        path = Path(path)
+        with self.cond:
+            if path in self.pending:
+                self.coalesced += 1
+                del self.pending[path]
+            self.pending[path] = (data, encode)
+            if self.thread is None:
+                # 第一次保存时启动（守护线程，退出前由 close 等待写入完成）
+                self.thread = threading.Thread(target=self._loop, daemon=True)
+                self.thread.start()
+            self.cond.notify_all()
+
+    def _loop(self):
+        """后台线程主循环"""
+        while True:
+            with self.cond:
+                while not self.pending and self.running:
+                    self.cond.wait()
+                if not self.pending:
+                    return
+                path = next(iter(self.pending))
+                data, encode = self.pending.pop(path)
+                self.busy = True
+
+            start = time.perf_counter()
+            size, error = 0, None
+            try:
+                size = write_atomic(path, encode(data))
+            except Exception as e:  # 写入失败不影响游戏，结果中返回异常
+                error = e
+            duration = time.perf_counter() - start
+
+            with self.cond:
+                self.busy = False
+                if error is None:
+                    self.saves += 1
+                    self.last_duration = duration
+                    self.last_size = size
+                if self.result is None:
+                    self.result = [0.0, 0, None]
+                self.result[0] += duration
+                self.result[1] += size
+                self.result[2] = self.result[2] or error
+                self.cond.notify_all()
+
+    def poll(self):
+        """
+        取得已完成的写入结果，还有提交未写完时不返回
+        :return: (合计耗时秒数, 合计字节数, 异常或 None)，没有新结果返回 None
+        """
+        with self.cond:
+            if self.pending or self.busy or self.result is None:
+                return None
+            result, self.result = tuple(self.result), None
+        return result
+
+    def flush(self, timeout: float | None = None) -> bool:
+        """
+        等待已提交的存档写入完成
+        :return: bool，超时返回 False
+        """
+        with self.cond:
+            return self.cond.wait_for(
+                lambda: not self.pending and not self.busy, timeout
+            )
+
+    def close(self):
+        """写完已提交的存档，停止线程"""
+        with self.cond:
+            self.running = False
+            self.cond.notify_all()
+        if self.thread:
+            self.thread.join()
+            self.thread = None
+
 
 class SaveData:
     # 默认存档数据
@@ -12,12 +189,14 @@ class SaveData:
         "world": "pasture",
         "player": {"x": 10, "y": 10},
         "time": {"time": 1, "day": 1, "month": 0, "year": 1, "weekday": 0},
-        "settings": {"language": "zh-CN", "fps": 30},
+        "settings": {"language": "zh-CN", "fps": 30, "color_depth": "auto"},
     }
 
     def __init__(self, data=None):
         """初始化存档数据"""
         self.data = data if data else self.DEFAULT_SAVE.copy()
+        # 后台存档线程（save_async 时创建）
+        self.writer = None
 
     @classmethod
     def load(cls, path: str | Path):
@@ -41,14 +220,39 @@ class SaveData:
             save.save(path)
             return save
 
-    def save(self, path: str | Path):
+    def save(self, path: str | Path) -> int:
         """
-        保存存档到指定文件
+        保存存档到指定文件（原子写入，见 write_atomic）
         :param path: 存档文件路径
+        :return: 写入的字节数
         """
-        path = Path(path)
-        with path.open("w", encoding="utf-8") as f:
-            json.dump(self.data, f, ensure_ascii=False, indent=4)
+        return write_atomic(path, to_json(self.data))
+
+    def save_async(self, path: str | Path):
+        """
+        在后台线程保存存档，立即返回
+        当前数据立即复制一份，之后的修改不影响这次保存
+        :param path: 存档文件路径
+        """
+        self.write_async(path, copy.deepcopy(self.data))
+
+    def write_async(self, path: str | Path, data, encode=to_json):
+        """
+        在后台线程编码并写入其他存档文件，见 SaveWriter.submit
+        """
+        if self.writer is None:
+            self.writer = SaveWriter()
+        self.writer.submit(path, data, encode)
+
+    def poll(self):
+        """最近完成的后台保存结果，见 SaveWriter.poll"""
+        return self.writer.poll() if self.writer else None
+
+    def close(self):
+        """等待后台保存完成"""
+        if self.writer:
+            self.writer.close()
+            self.writer = None
 
     # 方便访问存档数据的属性
     @property
@@ -0,0 +1,357 @@
+# core/savefile.py
+# 二进制存档
+
+import struct
+import threading
+import zlib
+from pathlib import Path
+
+import numpy as np
+
+from core.tile import TILE_DTYPE
+
+"""
+[二进制存档]
+地图本身不写入存档，只记录基础地图（地图文件）的名称与尺寸，
+以及与基础地图不同的格子，地图越大、修改越少，节省越多。
+
+文件结构（小端）：
+    文件头   "TFSV" 版本 (uint16) 段数 (uint16)
+    段目录   每段 标签 (4 字节) 偏移 (uint64) 长度 (uint32)
+    各段数据
+
+段       内容
+WRLD    基础地图：宽 (uint32) 高 (uint32) 区块边长 (uint16) 名称 (UTF-8)
+PLYR    玩家位置 x, y (int32)
+TIME    游戏时间 time, day, month, year, weekday (int32)
+CROP    作物，CropField.pack 的结果（zlib 压缩）
+DLTA    地图修改：区块数、格子数 (uint32)，
+        区块目录 每个 cy, cx (int32) 起始序号、格子数 (uint32)，按区块排序，
+        然后为全部格子的区块内索引 (uint16) 与格子（紧凑格式），整体 zlib 压缩
+
+读取时只解析文件头与段目录，各段在访问时才读取，不读取基础地图。
+地图修改整体解压（几千个格子只有几十 KB），按区块目录取出某个区块（delta_chunk），
+或一次写入全部修改（apply_delta）。
+编码与加载都是整体的数组运算，不按区块循环。
+
+保存流程：
+- WorldDelta 监听地图修改，记录分散写入的格子与矩形写入的区块
+- snapshot（持有 player_lock）复制玩家、时间、作物与记录的格子、区块
+- encode（后台线程，见 core/save.py SaveWriter）与基础地图比较、压缩并生成文件
+"""
+
+MAGIC = b"TFSV"
+SAVEFILE_VERSION = 2
+
+HEADER = struct.Struct("<4sHH")
+ENTRY = struct.Struct("<4sQI")
+WORLD = struct.Struct("<IIH")
+PLAYER = struct.Struct("<ii")
+TIME = struct.Struct("<iiiii")
+TIME_FIELDS = ("time", "day", "month", "year", "weekday")
+DELTA_HEADER = struct.Struct("<II")
+DELTA_ENTRY = np.dtype(
+    [("cy", "<i4"), ("cx", "<i4"), ("start", "<u4"), ("count", "<u4")]
+)
+
+# 地图修改记录的区块边长
+DELTA_CHUNK = 16
+
+
+class WorldDelta:
+    """
+    地图修改记录
+    - 注册为 world 的格子修改监听器：分散写入记录格子，矩形区域写入记录区块
+    - snapshot：复制记录的格子与区块的当前内容（调用方持有 player_lock）
+    """
+
+    def __init__(self, world, chunk_size: int = DELTA_CHUNK):
+        """
+        :param world: World 或 ChunkedWorld 对象
+        :param chunk_size: 区块边长（格），区块内索引为 uint16，最大 256
+        """
+        if not 0 < chunk_size <= 256:
+            raise ValueError(f"区块边长必须在 1-256 之间: {chunk_size}")
+        self.world = world
+        self.chunk_size = chunk_size
+        # 分散写入的格子 [y * width + x 数组]，snapshot 时去重合并
+        self.cells = []
+        # 矩形区域写入涉及的区块 {(cy, cx)}
+        self.chunks = set()
+        self.lock = threading.Lock()
+        world.add_cell_listener(self.mark)
+
+    def mark(self, x: int, y: int, w: int, h: int, cells=None):
+        """格子修改监听器"""
+        if cells is not None:
+            xs, ys = cells
+            keys = np.asarray(ys, dtype=np.int64) * self.world.width + xs
+            with self.lock:
+                self.cells.append(keys.ravel())
+            return
+        cs = self.chunk_size
+        chunks = [
+            (cy, cx)
+            for cy in range(y // cs, (y + h - 1) // cs + 1)
+            for cx in range(x // cs, (x + w - 1) // cs + 1)
+        ]
+        with self.lock:
+            self.chunks.update(chunks)
+
+    def snapshot(self):
+        """
+        复制记录的格子与区块的当前内容
+        :return: (cells, chunks)
+            cells: (xs, ys, tiles) 分散写入的格子
+            chunks: {(cy, cx): 紧凑格式数组}，地图边缘的区块可能小于区块边长
+        """
+        cs, world = self.chunk_size, self.world
+        with self.lock:
+            keys = np.unique(np.concatenate(self.cells)) if self.cells else None
+            self.cells = [keys] if keys is not None else []
+            chunks = sorted(self.chunks)
+        if keys is None:
+            keys = np.empty(0, dtype=np.int64)
+        ys, xs = np.divmod(keys, world.width)
+        cells = (xs, ys, np.array(world.read_cells(xs, ys)))
+
+        regions = {}
+        for cy, cx in chunks:
+            top, left = cy * cs, cx * cs
+            bottom, right = min(top + cs, world.height), min(left + cs, world.width)
+            regions[(cy, cx)] = np.array(world.read_region(top, left, bottom, right))
+        return cells, regions
+
+
+def snapshot(world, delta: WorldDelta, player, game_time, crops) -> dict:
+    """
+    复制保存所需的全部状态（调用方持有 player_lock），之后可以在其他线程 encode
+    :return: dict，传给 encode
+    """
+    return {
+        "world": (world.name, world.width, world.height, delta.chunk_size),
+        "base": world.read_base,
+        "player": (player.x, player.y),
+        "time": game_time.to_dict(),
+        "crops": crops.pack(),
+        "delta": delta.snapshot(),
+    }
+
+
+def collect_delta(cells, regions: dict, chunk_size: int, width: int):
+    """
+    合并记录的格子与区块，同一格子只保留一次
+    :return: (xs, ys, tiles)
+    """
+    xs, ys, tiles = [cells[0]], [cells[1]], [cells[2]]
+    for (cy, cx), region in regions.items():
+        rows, cols = np.indices(region.shape)
+        ys.append(cy * chunk_size + rows.ravel())
+        xs.append(cx * chunk_size + cols.ravel())
+        tiles.append(region.ravel())
+    xs, ys, tiles = np.concatenate(xs), np.concatenate(ys), np.concatenate(tiles)
+    _, first = np.unique(ys * width + xs, return_index=True)
+    return xs[first], ys[first], tiles[first]
+
+
+def encode_delta(xs, ys, tiles, base, chunk_size: int, width: int) -> bytes:
+    """
+    与基础地图比较，生成 DLTA 段
+    :param xs, ys, tiles: collect_delta 的结果
+    :param base: base(xs, ys)，读取基础地图中的格子
+    """
+    # 每个格子 8 字节，按 uint64 整体比较，与基础地图相同的（例如修改后又还原）不保存
+    original = np.ascontiguousarray(base(xs, ys))
+    changed = tiles.view(np.uint64) != original.view(np.uint64)
+    xs, ys, tiles = xs[changed], ys[changed], tiles[changed]
+
+    cs = chunk_size
+    cols = -(-width // cs)
+    keys = (ys // cs) * cols + xs // cs
+    local = (ys % cs) * cs + xs % cs
+    order = np.lexsort((local, keys))
+    keys, local, tiles = keys[order], local[order], tiles[order]
+
+    chunks, start, count = np.unique(keys, return_index=True, return_counts=True)
+    directory = np.empty(len(chunks), dtype=DELTA_ENTRY)
+    directory["cy"], directory["cx"] = np.divmod(chunks, cols)
+    directory["start"], directory["count"] = start, count
+    payload = zlib.compress(
+        local.astype("<u2").tobytes() + np.ascontiguousarray(tiles).tobytes()
+    )
+    return DELTA_HEADER.pack(len(chunks), len(tiles)) + directory.tobytes() + payload
+
+
+def encode(state: dict) -> bytes:
+    """
+    生成存档文件内容（可在后台线程调用）
+    :param state: snapshot 的结果
+    :return: 文件字节串
+    """
+    name, width, height, chunk_size = state["world"]
+    time = state["time"]
+    sections = [
+        (b"WRLD", WORLD.pack(width, height, chunk_size) + name.encode("utf-8")),
+        (b"PLYR", PLAYER.pack(*state["player"])),
+        (b"TIME", TIME.pack(*(time[field] for field in TIME_FIELDS))),
+        (b"CROP", zlib.compress(state["crops"])),
+        (
+            b"DLTA",
+            encode_delta(
+                *collect_delta(*state["delta"], chunk_size, width),
+                state["base"],
+                chunk_size,
+                width,
+            ),
+        ),
+    ]
+
+    offset = HEADER.size + ENTRY.size * len(sections)
+    directory = []
+    for tag, data in sections:
+        directory.append(ENTRY.pack(tag, offset, len(data)))
+        offset += len(data)
+    header = HEADER.pack(MAGIC, SAVEFILE_VERSION, len(sections))
+    return header + b"".join(directory) + b"".join(data for _, data in sections)
+
+
+class SaveFile:
+    """
+    读取二进制存档（按需读取各段）
+    - world / player / time：基础地图信息、玩家位置、游戏时间
+    - crops：作物数据（CropField.unpack 使用）
+    - delta_chunks / delta_chunk / apply_delta：地图修改
+    """
+
+    def __init__(self, path: str | Path | None = None, data: bytes | None = None):
+        """
+        读取文件头与段目录
+        :param path: 存档文件路径
+        :param data: 或者整个存档文件的内容（例如录制文件中的存档）
+        """
+        self.path = Path(path) if path is not None else None
+        self.data = data
+        head = self._read(0, HEADER.size)
+        magic, version, count = HEADER.unpack(head)
+        if magic != MAGIC:
+            raise ValueError(f"不是存档文件: {self.path}")
+        if version != SAVEFILE_VERSION:
+            raise ValueError(f"不支持的存档版本: {version}")
+        # 段目录 {标签: (偏移, 长度)}
+        self.sections = {}
+        directory = self._read(HEADER.size, ENTRY.size * count)
+        for tag, offset, length in ENTRY.iter_unpack(directory):
+            self.sections[tag] = (offset, length)
+
+        # 已读取的段 {标签: bytes}，解压后的地图修改（见 _delta）
+        self.cache = {}
+        self.delta = None
+
+    def _read(self, offset: int, length: int) -> bytes:
+        """读取文件中的一段字节"""
+        if self.data is not None:
+            return self.data[offset : offset + length]
+        with self.path.open("rb") as f:
+            f.seek(offset)
+            return f.read(length)
+
+    def to_bytes(self) -> bytes:
+        """整个存档文件的内容"""
+        return self.data if self.data is not None else self.path.read_bytes()
+
+    def section(self, tag: bytes) -> bytes:
+        """读取一段数据（第一次访问时读取文件），不存在时抛出 KeyError"""
+        if tag not in self.cache:
+            self.cache[tag] = self._read(*self.sections[tag])
+        return self.cache[tag]
+
+    @property
+    def world(self):
+        """基础地图 (名称, 宽, 高, 区块边长)"""
+        data = self.section(b"WRLD")
+        width, height, chunk_size = WORLD.unpack_from(data)
+        return data[WORLD.size :].decode("utf-8"), width, height, chunk_size
+
+    @property
+    def player(self) -> dict:
+        """玩家位置 {'x': int, 'y': int}"""
+        x, y = PLAYER.unpack(self.section(b"PLYR"))
+        return {"x": x, "y": y}
+
+    @property
+    def time(self) -> dict:
+        """游戏时间，与 GameTime.to_dict 格式相同"""
+        return dict(zip(TIME_FIELDS, TIME.unpack(self.section(b"TIME"))))
+
+    @property
+    def crops(self) -> bytes:
+        """作物数据，传给 CropField.unpack"""
+        return zlib.decompress(self.section(b"CROP"))
+
+    def matches(self, world) -> bool:
+        """存档的基础地图是否与 world 相同（名称与尺寸）"""
+        name, width, height, _ = self.world
+        return (name, width, height) == (world.name, world.width, world.height)
+
+    def _delta(self):
+        """
+        解压地图修改（第一次访问时）
+        :return: (区块目录, 区块内索引 int64, 格子)
+        """
+        if self.delta is None:
+            data = self.section(b"DLTA")
+            chunks, n = DELTA_HEADER.unpack_from(data)
+            directory = np.frombuffer(
+                data, dtype=DELTA_ENTRY, count=chunks, offset=DELTA_HEADER.size
+            )
+            payload = zlib.decompress(data[DELTA_HEADER.size + directory.nbytes :])
+            # 区块内索引为 uint16，转为 int64 再计算地图坐标（地图边长可超过 65535）
+            local = np.frombuffer(payload, dtype="<u2", count=n).astype(np.int64)
+            tiles = np.frombuffer(payload, dtype=TILE_DTYPE, count=n, offset=2 * n)
+            self.delta = (directory, local, tiles)
+        return self.delta
+
+    def _coords(self, cy, cx, local):
+        """区块坐标与区块内索引转为地图坐标 (xs, ys)"""
+        cs = self.world[3]
+        return cx * cs + local % cs, cy * cs + local // cs
+
+    @property
+    def delta_chunks(self):
+        """有修改的区块 [(cy, cx)]"""
+        directory = self._delta()[0]
+        return list(zip(directory["cy"].tolist(), directory["cx"].tolist()))
+
+    def delta_chunk(self, cy: int, cx: int):
+        """
+        取出一个区块的修改
+        :return: (xs, ys, tiles) 地图坐标与格子，区块没有修改时返回 None
+        """
+        directory, local, tiles = self._delta()
+        # 区块目录按 (cy, cx) 排序
+        keys = directory["cy"].astype(np.int64) << 32 | directory["cx"].astype(
+            np.uint32
+        )
+        key = cy << 32 | (cx & 0xFFFFFFFF)
+        i = int(np.searchsorted(keys, key))
+        if i == len(keys) or keys[i] != key:
+            return None
+        part = slice(
+            directory["start"][i], directory["start"][i] + directory["count"][i]
+        )
+        xs, ys = self._coords(cy, cx, local[part])
+        return xs, ys, tiles[part].copy()
+
+    def apply_delta(self, world) -> int:
+        """
+        把地图修改一次写入 world
+        :return: 写入的格子数
+        """
+        directory, local, tiles = self._delta()
+        if not len(tiles):
+            return 0
+        cy = np.repeat(directory["cy"].astype(np.int64), directory["count"])
+        cx = np.repeat(directory["cx"].astype(np.int64), directory["count"])
+        xs, ys = self._coords(cy, cx, local)
+        world.write_cells(xs, ys, tiles.copy())
+        return len(tiles)
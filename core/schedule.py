@@ -0,0 +1,112 @@
+# core/schedule.py
+# 游戏时间事件调度
+
+import heapq
+import itertools
+
+"""
+[事件调度]
+以游戏分钟为单位安排未来事件（作物生长阶段、动物饥饿、送货等）。
+事件保存在按 (触发时间, 序号) 排序的堆中：
+- 安排 O(log n)，取消 O(1)（只做标记，弹出时跳过）
+- 未到期的事件不占用任何处理时间
+- 一次推进多分钟时，按触发时间先后依次执行到期事件，同一分钟按安排顺序
+
+时间使用 GameTime.now 返回的绝对游戏分钟。
+"""
+
+
+class Event:
+    """
+    已安排的事件，通过 EventScheduler.cancel 取消
+    - at: 触发时间（绝对游戏分钟）
+    - every: 重复间隔（分钟），None 表示只触发一次
+    """
+
+    __slots__ = ("at", "every", "callback", "args", "cancelled")
+
+    def __init__(self, at: int, callback, args=(), every: int | None = None):
+        self.at = at
+        self.every = every
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+
+
+class EventScheduler:
+    """
+    游戏时间事件调度器
+    - schedule / schedule_in：在指定时间 / 一段时间后触发回调
+    - cancel：取消事件
+    - advance：推进到指定时间，依次执行到期事件（由 GameTime.tick 调用）
+    """
+
+    def __init__(self, now: int = 0):
+        """
+        :param now: 当前绝对游戏分钟
+        """
+        self.now = now
+        # 堆元素 (触发时间, 序号, Event)
+        self.heap = []
+        self.counter = itertools.count()
+        # 未取消的事件数
+        self.pending = 0
+
+    def __len__(self):
+        return self.pending
+
+    def schedule(self, at: int, callback, *args, every: int | None = None) -> Event:
+        """
+        在绝对时间 at 触发 callback(*args)
+        :param at: 绝对游戏分钟，早于当前时间时在下一次推进时立即触发
+        :param every: 可选，之后每隔 every 分钟重复触发
+        :return: Event，可用于取消
+        """
+        if every is not None and every <= 0:
+            raise ValueError(f"重复间隔必须大于 0: {every}")
+        event = Event(at, callback, args, every)
+        heapq.heappush(self.heap, (at, next(self.counter), event))
+        self.pending += 1
+        return event
+
+    def schedule_in(self, delay: int, callback, *args, every: int | None = None):
+        """在 delay 分钟后触发 callback(*args)"""
+        return self.schedule(self.now + delay, callback, *args, every=every)
+
+    def cancel(self, event: Event):
+        """取消事件（重复事件不再继续）"""
+        if not event.cancelled:
+            event.cancelled = True
+            self.pending -= 1
+
+    def next_time(self):
+        """下一个未取消事件的触发时间，没有事件返回 None"""
+        heap = self.heap
+        while heap and heap[0][2].cancelled:
+            heapq.heappop(heap)
+        return heap[0][0] if heap else None
+
+    def advance(self, now: int) -> int:
+        """
+        推进到 now，依次执行所有到期的事件
+        回调中安排的新事件如果也已到期，会在本次推进中继续执行
+        :return: 执行的事件数
+        """
+        heap = self.heap
+        fired = 0
+        while heap and heap[0][0] <= now:
+            at, _, event = heapq.heappop(heap)
+            if event.cancelled:
+                continue
+            # 回调执行期间 now 为事件的触发时间，schedule_in 相对事件时间计算
+            self.now = max(self.now, at)
+            if event.every is None:
+                event.cancelled = True
+                self.pending -= 1
+            else:
+                event.at = at + event.every
+                heapq.heappush(heap, (event.at, next(self.counter), event))
+            event.callback(*event.args)
+            fired += 1
+        self.now = now
+        return fired
@@ -15,6 +15,7 @@ def settings():
     设置界面
     - 支持语言切换
     - 支持 FPS 设置 (30/60)
+    - 支持颜色深度设置 (auto/truecolor/256/16/mono)
     - 上下选择设置项，左右修改当前选项
     - 修改后自动保存
     """
@@ -29,12 +30,15 @@ def settings():
     languages = list(lang_data.keys())  # ['zh-CN', 'en-US']
 
     # 设置选项
-    settings_keys = ["language", "fps"]
+    settings_keys = ["language", "fps", "color_depth"]
     selected_index = 0  # 当前选择的设置项
 
     # FPS 可选值
     fps_options = [30, 60]
 
+    # 颜色深度可选值，auto 根据终端检测
+    color_depth_options = ["auto", "truecolor", "256", "16", "mono"]
+
     try:
         with term.fullscreen(), term.cbreak(), term.hidden_cursor():
             while True:
@@ -44,6 +48,7 @@ def settings():
                 # 当前语言
                 current_lang = save_data.settings.get("language", "zh-CN")
                 current_fps = save_data.settings.get("fps", 60)
+                current_depth = save_data.settings.get("color_depth", "auto")
 
                 # 标题
                 title = lang_data[current_lang]["title"]
@@ -61,6 +66,10 @@ def settings():
                         display = f"{lang_data[current_lang]['language']}: {value_name} <{save_data.settings['language']}>"
                     elif key == "fps":
                         display = f"FPS: {current_fps}"
+                    elif key == "color_depth":
+                        display = (
+                            f"{lang_data[current_lang]['color_depth']}: {current_depth}"
+                        )
                     else:
                         display = key
                     print(term.move(2 + idx, 0) + prefix + display)
@@ -93,6 +102,20 @@ def settings():
                             idx = (idx + 1) % len(fps_options)
                         save_data.settings["fps"] = fps_options[idx]
                         save_data.save(SAVE_PATH)
+                    elif current_key == "color_depth":
+                        # 与渲染器相同：存档中可能写成数字（例如 256），
+                        # 统一转为字符串，不支持的值按 auto（第一项）处理
+                        depth = str(save_data.settings.get("color_depth", "auto"))
+                        if depth in color_depth_options:
+                            idx = color_depth_options.index(depth)
+                        else:
+                            idx = 0
+                        if key.name == "KEY_LEFT":
+                            idx = (idx - 1) % len(color_depth_options)
+                        else:
+                            idx = (idx + 1) % len(color_depth_options)
+                        save_data.settings["color_depth"] = color_depth_options[idx]
+                        save_data.save(SAVE_PATH)
 
     finally:
         print(term.clear)
@@ -0,0 +1,106 @@
+# core/snapshot.py
+# 游戏状态快照
+
+"""
+[状态快照]
+渲染线程不再持有 player_lock：模拟一侧（输入、时间推进）在锁内修改状态后，
+生成一个只读的快照并替换引用，渲染线程读取当前引用即可，不需要等待任何锁。
+
+    输入 / 时间线程                 渲染线程
+    with player_lock:
+        修改状态
+        publish() ──► current ──► read() ──► renderer.draw(...)
+
+快照内容：
+- player: 玩家位置 (x, y)
+- time: HUD 文本（日期、星期、时间）与版本
+- debug_info: 调试信息
+
+快照生成后不再修改，替换引用是原子操作（单条赋值），读者拿到的总是完整的一份。
+地图格子不复制到快照中：修改只涉及少数格子，渲染与写入同时发生时可能读到
+写入中的数据，但写入完成后 world 监听器会标记重绘，下一帧即恢复一致。
+修改过的格子不需要单独记录：渲染器每帧与前缓冲比较，只重绘有变化的区段。
+"""
+
+
+class PlayerState:
+    """玩家状态快照，提供与 Player 相同的 x / y 属性"""
+
+    __slots__ = ("x", "y")
+
+    def __init__(self, x: int, y: int):
+        self.x = x
+        self.y = y
+
+
+class TimeState:
+    """
+    时间状态快照，提供渲染器使用的 GameTime 接口 (hud_version / hud)
+    HUD 文本在模拟一侧生成，渲染时不再读取 GameTime
+    """
+
+    __slots__ = ("text", "width", "version")
+
+    def __init__(self, text: str, width: int, version):
+        self.text = text
+        self.width = width
+        self.version = version
+
+    @property
+    def hud_version(self):
+        return self.version
+
+    def hud(self):
+        """:return: (文本, 显示宽度, 版本)，与 GameTime.hud 相同"""
+        return self.text, self.width, self.version
+
+
+class Snapshot:
+    """
+    只读的游戏状态快照
+    - version: 快照序号，每次发布递增
+    """
+
+    __slots__ = ("version", "player", "time", "debug_info")
+
+    def __init__(self, version: int, player, time, debug_info):
+        self.version = version
+        self.player = player
+        self.time = time
+        self.debug_info = debug_info
+
+
+class SnapshotBuffer:
+    """
+    快照发布与读取
+    - publish：模拟一侧在修改状态后调用（持有 player_lock），生成新快照并替换引用
+    - read：渲染一侧调用，不加锁，返回最新的快照
+    """
+
+    def __init__(self):
+        # 当前快照（只替换，不修改）
+        self.current = None
+        self.version = 0
+
+    def publish(self, player, game_time=None, debug_info=None) -> Snapshot:
+        """
+        生成并发布新快照
+        :param player: Player 对象
+        :param game_time: GameTime 对象，可选
+        :param debug_info: 调试信息
+        :return: 新的 Snapshot
+        """
+        time_state = None
+        if game_time is not None:
+            time_state = TimeState(*game_time.hud())
+        self.version += 1
+        snapshot = Snapshot(
+            self.version, PlayerState(player.x, player.y), time_state, debug_info
+        )
+        # 替换引用，读者看到旧快照或新快照，不会看到一半
+        self.current = snapshot
+        return snapshot
+
+    def read(self) -> Snapshot:
+        """读取最新的快照（不加锁）"""
+        return self.current
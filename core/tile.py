@@ -0,0 +1,213 @@
+# core/tile.py
+# 地图格子存储格式
+
+import os
+import numpy as np
+from pathlib import Path
+
+"""
+[紧凑格式]
+地图是一个 二维结构化 numpy 数组 (height, width)，每个格子 8 字节：
+
+字段     类型        说明
+char    uint32     字符，存为 Unicode 整数
+flags   uint8      bit0 可通行，bit1 透明，bit2-7 地形类型 (0-63)
+rgb     uint8[3]   颜色值 R,G,B (0-255)，透明时忽略
+
+[旧格式 (版本 0)]
+三维 int 数组 (height, width, 6)，每格 48 字节：
+字符 / 是否可通行 / 地形类型 / R / G / B，颜色 -1 表示透明。
+旧格式地图加载时自动转换，也可以使用
+`python core/tile.py map/*.npy` 批量迁移。
+"""
+
+# 当前格式版本
+TILE_VERSION = 1
+
+# 每个版本对应的 dtype，加载时据此识别格式
+TILE_DTYPE = np.dtype([("char", "<u4"), ("flags", "u1"), ("rgb", "u1", (3,))])
+TILE_DTYPES = {1: TILE_DTYPE}
+
+# flags 位定义
+WALKABLE = 0x01  # 可通行
+TRANSPARENT = 0x02  # 透明（无颜色）
+TERRAIN_SHIFT = 2  # 地形类型起始位
+TERRAIN_MASK = 0xFC  # 地形类型所占位
+TERRAIN_MAX = TERRAIN_MASK >> TERRAIN_SHIFT  # 地形类型最大值 63
+
+
+def new_tiles(height: int, width: int):
+    """创建空白地图（空格、可通行、透明、地形 0）"""
+    tiles = np.zeros((height, width), dtype=TILE_DTYPE)
+    tiles["char"] = ord(" ")
+    tiles["flags"] = WALKABLE | TRANSPARENT
+    return tiles
+
+
+def tile_version(tiles) -> int:
+    """
+    识别地图数组的格式版本
+    :return: int，0 表示旧格式，其余为紧凑格式版本号
+    """
+    for version, dtype in TILE_DTYPES.items():
+        if tiles.dtype == dtype:
+            return version
+    if tiles.dtype.names is None and tiles.ndim == 3 and tiles.shape[2] == 6:
+        return 0
+    raise ValueError(f"无法识别的地图格式: dtype={tiles.dtype}, shape={tiles.shape}")
+
+
+def from_legacy(legacy):
+    """
+    旧格式 (h, w, 6) 转为紧凑格式
+    :param legacy: 旧格式数组
+    :return: 紧凑格式数组
+    """
+    terrain = legacy[:, :, 2]
+    if terrain.min() < 0 or terrain.max() > TERRAIN_MAX:
+        raise ValueError(f"地形类型超出范围 0-{TERRAIN_MAX}，无法转换")
+
+    colors = legacy[:, :, 3:6]
+    transparent = (colors == -1).any(axis=2)
+
+    tiles = np.empty(legacy.shape[:2], dtype=TILE_DTYPE)
+    tiles["char"] = legacy[:, :, 0]
+    tiles["flags"] = (
+        (legacy[:, :, 1] != 0) * WALKABLE
+        + transparent * TRANSPARENT
+        + (terrain << TERRAIN_SHIFT)
+    )
+    tiles["rgb"] = np.where(transparent[:, :, None], 0, colors.clip(0, 255))
+    return tiles
+
+
+def to_legacy(tiles):
+    """紧凑格式转回旧格式 (h, w, 6)，用于调试或导出"""
+    legacy = np.empty(tiles.shape + (6,), dtype=int)
+    legacy[:, :, 0] = tiles["char"]
+    legacy[:, :, 1] = walkable(tiles)
+    legacy[:, :, 2] = terrain(tiles)
+    legacy[:, :, 3:6] = tiles["rgb"]
+    legacy[transparent(tiles), 3:6] = -1
+    return legacy
+
+
+def load_tiles(path: str | Path, mmap_mode: str | None = None):
+    """
+    加载地图文件，旧格式自动转换为紧凑格式
+    :param path: .npy 地图文件路径
+    :param mmap_mode: None 一次性读入内存；
+        "r" 只读内存映射，"c" 写时复制，"r+" 读写（修改直接写回文件）
+        内存映射只在访问时才读取对应的页，启动耗时与地图大小无关
+    :return: 紧凑格式数组
+    """
+    tiles = np.load(path, mmap_mode=mmap_mode)
+    if tile_version(tiles) == 0:
+        # 旧格式无法直接映射，转换后常驻内存
+        tiles = from_legacy(tiles)
+    return tiles
+
+
+def save_tiles(path: str | Path, tiles):
+    """
+    保存地图文件
+    先写入临时文件再替换，正在映射原文件的进程不受影响
+    :param path: .npy 地图文件路径
+    :param tiles: 紧凑格式数组
+    """
+    path = Path(path)
+    tmp = path.with_name(path.name + ".tmp")
+    with tmp.open("wb") as f:
+        np.save(f, tiles)
+    os.replace(tmp, path)
+
+
+def walkable(tiles):
+    """可通行平面 (bool)"""
+    return (tiles["flags"] & WALKABLE) != 0
+
+
+def transparent(tiles):
+    """透明平面 (bool)"""
+    return (tiles["flags"] & TRANSPARENT) != 0
+
+
+def terrain(tiles):
+    """地形类型平面"""
+    return tiles["flags"] >> TERRAIN_SHIFT
+
+
+def set_terrain(tiles, value: int):
+    """
+    批量设置地形类型
+    :param tiles: 地图数组或其切片视图
+    :param value: 地形类型 0-63
+    """
+    if not 0 <= value <= TERRAIN_MAX:
+        raise ValueError(f"地形类型超出范围 0-{TERRAIN_MAX}: {value}")
+    flags = tiles["flags"] & (~TERRAIN_MASK & 0xFF)
+    tiles["flags"] = flags | (value << TERRAIN_SHIFT)
+
+
+def set_color(tiles, rgb):
+    """
+    批量设置颜色
+    :param tiles: 地图数组或其切片视图
+    :param rgb: (r, g, b)，None 或含 -1 表示透明
+    """
+    if rgb is None or -1 in rgb:
+        tiles["flags"] |= TRANSPARENT
+        tiles["rgb"] = 0
+    else:
+        if not all(0 <= c <= 255 for c in rgb):
+            raise ValueError(f"颜色值超出范围 0-255: {rgb}")
+        tiles["flags"] &= ~TRANSPARENT & 0xFF
+        tiles["rgb"] = rgb
+
+
+def pack_colors(tiles):
+    """
+    颜色打包为单个整数 0xRRGGBB，透明为 -1
+    :return: int32 数组（新数组）
+    """
+    rgb = tiles["rgb"].astype(np.int32)
+    packed = (rgb[..., 0] << 16) | (rgb[..., 1] << 8) | rgb[..., 2]
+    packed[transparent(tiles)] = -1
+    return packed
+
+
+def migrate(path: str | Path, output: str | Path | None = None) -> bool:
+    """
+    将旧格式地图文件转换为紧凑格式
+    :param path: 地图文件路径
+    :param output: 输出路径，默认覆盖原文件
+    :return: bool，发生转换返回 True，已是最新格式返回 False
+    """
+    path = Path(path)
+    data = np.load(path, mmap_mode="r")
+    if tile_version(data) == TILE_VERSION:
+        return False
+    save_tiles(Path(output) if output else path, from_legacy(data))
+    return True
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="地图格式迁移工具")
+    parser.add_argument("paths", nargs="+", help="地图文件路径，例如 map/*.npy")
+    parser.add_argument(
+        "-o", "--output", help="输出目录（默认覆盖原文件）", default=None
+    )
+    args = parser.parse_args()
+
+    for p in map(Path, args.paths):
+        out = Path(args.output) / p.name if args.output else None
+        if out:
+            out.parent.mkdir(parents=True, exist_ok=True)
+        before = p.stat().st_size
+        if migrate(p, out):
+            after = (out or p).stat().st_size
+            print(f"{p}: 已转换 ({before} -> {after} 字节)")
+        else:
+            print(f"{p}: 已是最新格式，跳过")
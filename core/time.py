@@ -1,6 +1,19 @@
 # core/player.py
 # 时间日期
 
+from wcwidth import wcswidth
+
+from core.schedule import EventScheduler
+
+# 每天的分钟数
+DAY_MINUTES = 1440
+# 每月天数、每年月数（季节）
+MONTH_DAYS = 30
+YEAR_MONTHS = 4
+# 午夜（日期加一）对应的游戏分钟
+MIDNIGHT = 1080
+
+
 class GameTime:
     """
     游戏时间管理类
@@ -21,13 +34,27 @@ class GameTime:
         self.weekday = 0 if save_data is None else save_data.get("weekday", 0)
         self.debug_message = ""  # 用于显示调试信息
 
+        # 时间状态版本号，时间或日期变化时递增，用于判断 HUD 文本是否需要重新生成
+        self.version = 0
+        # HUD 文本缓存 (文本, 显示宽度, 生成时的版本)
+        self._hud = None
+
+        # 事件调度器，由 tick 推进
+        self.scheduler = EventScheduler(self.now)
+        # 模拟系统（作物等），每个新的游戏日调用 system.new_day(game_time)，
+        # 批量推进时优先调用 system.advance_days(days, game_time)
+        self.systems = []
+
     def tick(self, minutes=1):
         """
         推进游戏时间
         :param minutes: int，每次推进的分钟数
         """
+        if not minutes:
+            return
         previous_time = self.time
         self.time += minutes
+        self.version += 1
 
         # 先判断是否跨过午夜 AM 0:00 / 1080
         if previous_time < 1080 <= self.time:
@@ -38,10 +65,83 @@ class GameTime:
             self.time %= 1440
             self.next_day()
 
+        # 执行到期的事件
+        self.scheduler.advance(self.now)
+
+    @property
+    def now(self):
+        """
+        绝对游戏分钟（从第 1 年春 1 日 AM 6:00 开始计算），用于事件调度
+        午夜 (1080) 起日期已经加一，但仍属于前一天 AM 6:00 开始的 1440 分钟
+        """
+        days = ((self.year - 1) * YEAR_MONTHS + self.month) * MONTH_DAYS + self.day - 1
+        if self.time >= MIDNIGHT:
+            days -= 1
+        return days * DAY_MINUTES + self.time
+
+    def add_system(self, system):
+        """
+        注册模拟系统
+        :param system: 提供 new_day(game_time) 方法的对象，例如 CropField；
+            可选提供 advance_days(days, game_time)，批量推进多天
+        """
+        self.systems.append(system)
+
+    def advance(self, minutes: int):
+        """
+        快速推进游戏时间（读档补算、睡觉等），不逐分钟模拟
+        - 日期直接换算，模拟系统按天数批量推进
+        - 事件按时间顺序执行：先推进到事件时间，执行后继续，
+          事件（例如下雨）对之后几天的影响与逐分钟推进一致
+        :param minutes: 推进的分钟数
+        """
+        target = self.now + minutes
+        while True:
+            due = self.scheduler.next_time()
+            stop = target if due is None or due > target else max(due, self.now)
+            self._jump(stop - self.now)
+            self.scheduler.advance(self.now)
+            if stop == target:
+                break
+
+    def advance_days(self, days: int):
+        """快速推进 days 天（时间不变），见 advance"""
+        self.advance(days * DAY_MINUTES)
+
+    def _jump(self, minutes: int):
+        """
+        直接跳到 minutes 分钟后，跨过的午夜数即为新的天数
+        模拟系统一次推进全部天数，不执行事件
+        """
+        if minutes <= 0:
+            return
+        start = self.now
+        end = start + minutes
+        days = (end - MIDNIGHT) // DAY_MINUTES - (start - MIDNIGHT) // DAY_MINUTES
+
+        # 由绝对分钟换算日期
+        self.time = end % DAY_MINUTES
+        index = end // DAY_MINUTES + (self.time >= MIDNIGHT)
+        self.day = index % MONTH_DAYS + 1
+        self.month = index // MONTH_DAYS % YEAR_MONTHS
+        self.year = index // (MONTH_DAYS * YEAR_MONTHS) + 1
+        self.weekday = (self.weekday + days) % 7
+        self.version += 1
+
+        if not days:
+            return
+        for system in self.systems:
+            if hasattr(system, "advance_days"):
+                system.advance_days(days, self)
+            else:
+                for _ in range(days):
+                    system.new_day(self)
+
     def new_day(self):
         """
         处理新的一天逻辑
         """
+        self.version += 1
         # 日期
         self.day += 1
         # 星期
@@ -55,6 +155,10 @@ class GameTime:
             if self.month == 0:
                 self.year += 1
 
+        # 模拟系统推进一天
+        for system in self.systems:
+            system.new_day(self)
+
     def next_day(self):
         """
         新的一天发生时触发的事件
@@ -121,6 +225,24 @@ class GameTime:
         week_name = weekdays[self.weekday]
         return week_name
 
+    @property
+    def hud_version(self):
+        """HUD 版本：时间状态版本与翻译器版本，任一变化则 HUD 文本需要重新生成"""
+        translator_version = getattr(self.translator, "version", 0)
+        return self.version, translator_version
+
+    def hud(self):
+        """
+        获取 HUD 文本（日期、星期、时间），只在时间变化或切换语言后重新生成
+        :return: (文本, 显示宽度, 版本)，例如 ("春 1日 (一) AM 6:00", 19, (3, 0))
+        """
+        version = self.hud_version
+        if self._hud is None or self._hud[2] != version:
+            date, week = self.get_date_text(), self.get_week_text()
+            text = f"{date} ({week}) {self.get_time_text()}"
+            self._hud = (text, wcswidth(text), version)
+        return self._hud
+
     def to_dict(self):
         """
         转为存档字典
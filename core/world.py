@@ -3,6 +3,7 @@
 
 import numpy as np
 from pathlib import Path
+from core.tile import WALKABLE, load_tiles, pack_colors
 
 """
 [地图系统]
@@ -12,17 +13,19 @@ from pathlib import Path
 在存档中记录玩家位置 (x, y) 和地图名称。
 
 [数据结构]
-每个地图是一个 三维 numpy 数组 (height, width, 6)，每个格子包含如下信息：
-
-索引    内容        类型     说明
-0      字符        int      字符，存为 Unicode 整数
-1      是否可通行   int      0=不可通行，1=可通行
-2      地形类型    int       1=路面，2=田地，后续可扩展
-3      R          int       颜色值 0-255，-1 表示透明
-4      G          int       颜色值 0-255，-1 表示透明
-5      B          int       颜色值 0-255，-1 表示透明
+每个地图是一个 二维结构化 numpy 数组 (height, width)，每个格子 8 字节：
+
+字段     类型        说明
+char    uint32     字符，存为 Unicode 整数
+flags   uint8      bit0 可通行，bit1 透明，bit2-7 地形类型 (1=路面，2=田地，后续可扩展)
+rgb     uint8[3]   颜色值 R,G,B (0-255)
+
+详见 core/tile.py，旧格式 (height, width, 6) 地图加载时自动转换。
 """
 
+# 可通行位图按段延迟生成，每段行数
+WALK_BAND = 64
+
 
 class World:
     """
@@ -32,33 +35,260 @@ class World:
     - 支持基于中心点的视口渲染（带颜色）
     """
 
-    def __init__(self, map_path: str):
-        """初始化地图"""
+    def __init__(self, map_path: str, mmap_mode: str | None = "c"):
+        """
+        初始化地图
+        :param map_path: 地图文件路径
+        :param mmap_mode: 默认 "c" 写时复制内存映射，只有视口和玩家附近的数据会被读入，
+            修改只在内存中，不写回地图文件；"r" 只读（写入时抛出 ValueError）；
+            None 表示一次性读入内存
+        """
         f = Path(map_path)
         if not f.exists():
             raise FileNotFoundError(f"地图文件不存在: {f}")
 
-        # 加载 numpy 地图文件
-        self.tiles = np.load(f, allow_pickle=True)
+        # 加载 numpy 地图文件（紧凑格式）
+        self.tiles = load_tiles(f, mmap_mode=mmap_mode)
 
         # 地图尺寸（高、宽）
         self.height, self.width = self.tiles.shape[:2]
 
-        # 地图名称（不含扩展名）
+        # 地图名称（不含扩展名）与文件路径
         self.name = f.stem
+        self.path = f
+        # 基础地图（地图文件中的原始数据，只读映射），见 read_base
+        self.base = None
+
+        # 可通行位图：每格 1 bit，四周各填充一格不可通行，越界坐标无需判断
+        # 按 64 行一段在首次访问时生成，内存映射的大地图不必在启动时全部读取
+        self.walk_bits = np.zeros(
+            (self.height + 2, (self.width + 2 + 7) // 8), dtype=np.uint8
+        )
+        self.walk_ready = np.zeros(
+            (self.height + WALK_BAND - 1) // WALK_BAND, dtype=bool
+        )
+
+        # 颜色代码平面（终端颜色深度低于真彩色时使用），见 quantize
+        self.quantizer = None
+        self.codes = None
+        self.codes_ready = None
+
+        # 地图修改监听器 callback(x, y, w, h)
+        self.listeners = []
+        # 格子修改监听器 callback(x, y, w, h, cells)，见 add_cell_listener
+        self.cell_listeners = []
+
+    def _build_walk_band(self, band: int):
+        """根据 tiles 生成第 band 段的可通行位图"""
+        y0 = band * WALK_BAND
+        y1 = min(y0 + WALK_BAND, self.height)
+        padded = np.zeros((y1 - y0, self.width + 2), dtype=bool)
+        padded[:, 1:-1] = self.tiles["flags"][y0:y1] & WALKABLE
+        self.walk_bits[y0 + 1 : y1 + 1] = np.packbits(padded, axis=1)
+        self.walk_ready[band] = True
+
+    def quantize(self, quantizer):
+        """
+        按终端颜色深度预先量化地图颜色，渲染时直接使用调色板索引
+        与可通行位图一样按段在首次访问时生成
+        :param quantizer: renderer.palette.Quantizer，None 或真彩色表示不量化
+        """
+        if quantizer is None or quantizer.depth == "truecolor":
+            self.quantizer = self.codes = self.codes_ready = None
+            return
+        self.quantizer = quantizer
+        self.codes = np.empty((self.height, self.width), dtype=np.int16)
+        self.codes_ready = np.zeros_like(self.walk_ready)
+
+    def _build_code_band(self, band: int):
+        """根据 tiles 生成第 band 段的颜色代码"""
+        y0 = band * WALK_BAND
+        y1 = min(y0 + WALK_BAND, self.height)
+        self.codes[y0:y1] = self.quantizer.quantize_tiles(self.tiles[y0:y1])
+        self.codes_ready[band] = True
+
+    def read_codes(self, top: int, left: int, bottom: int, right: int):
+        """
+        读取矩形区域的颜色代码
+        :return: int16 数组视图，未量化时返回 None
+        """
+        if self.codes is None:
+            return None
+        for band in range(top // WALK_BAND, (bottom - 1) // WALK_BAND + 1):
+            if not self.codes_ready[band]:
+                self._build_code_band(band)
+        return self.codes[top:bottom, left:right]
 
     def is_walkable(self, x: int, y: int) -> bool:
         """判断坐标是否可通行"""
         if 0 <= x < self.width and 0 <= y < self.height:
-            return bool(self.tiles[y, x, 1])
+            if not self.walk_ready[y // WALK_BAND]:
+                self._build_walk_band(y // WALK_BAND)
+            x += 1
+            return bool(self.walk_bits[y + 1, x >> 3] & (0x80 >> (x & 7)))
         return False
 
+    def is_walkable_many(self, xs, ys):
+        """
+        批量判断坐标是否可通行
+        :param xs: 横坐标数组
+        :param ys: 纵坐标数组（与 xs 形状相同）
+        :return: bool 数组，越界坐标为 False
+        """
+        # 越界坐标压到填充格上，不需要逐个判断
+        xs = np.clip(np.asarray(xs) + 1, 0, self.width + 1)
+        ys = np.clip(np.asarray(ys) + 1, 0, self.height + 1)
+
+        if not self.walk_ready.all():
+            rows = ys[(ys > 0) & (ys <= self.height)] - 1
+            for band in np.unique(rows // WALK_BAND):
+                if not self.walk_ready[band]:
+                    self._build_walk_band(band)
+
+        return (self.walk_bits[ys, xs >> 3] & (0x80 >> (xs & 7))) != 0
+
     def get_tile(self, x: int, y: int):
-        """获取单个格子数据"""
+        """获取单个格子数据（结构化记录，字段 char/flags/rgb）"""
         if not (0 <= x < self.width and 0 <= y < self.height):
             return None
         return self.tiles[y, x]
 
+    def read_region(self, top: int, left: int, bottom: int, right: int):
+        """
+        读取矩形区域 [top:bottom, left:right] 的格子
+        :return: 地图数组的切片视图
+        """
+        return self.tiles[top:bottom, left:right]
+
+    def _check_writable(self):
+        """只读映射 ("r") 的地图不能修改"""
+        if not self.tiles.flags.writeable:
+            raise ValueError(
+                f'地图以只读方式加载 (mmap_mode="r")，不能修改: {self.name}'
+            )
+
+    def _update_planes(self, xs, ys):
+        """
+        格子写入后更新可通行位图和颜色代码中对应的格子
+        尚未生成的行段跳过（首次访问时从已写入的 tiles 生成），不读取其他格子
+        :param xs: 写入的横坐标（一维数组）
+        :param ys: 写入的纵坐标（一维数组）
+        """
+        bands = ys // WALK_BAND
+        built = self.walk_ready[bands]
+        if built.any():
+            bx, by = xs[built] + 1, ys[built] + 1
+            # 同一字节可能有多个格子，用 ufunc.at 逐个修改
+            index = (by, bx >> 3)
+            mask = (0x80 >> (bx & 7)).astype(np.uint8)
+            walkable = (self.tiles["flags"][ys[built], xs[built]] & WALKABLE) != 0
+            np.bitwise_and.at(self.walk_bits, index, ~mask)
+            np.bitwise_or.at(
+                self.walk_bits, (by[walkable], bx[walkable] >> 3), mask[walkable]
+            )
+
+        if self.codes is not None:
+            built = self.codes_ready[bands]
+            if built.any():
+                cx, cy = xs[built], ys[built]
+                self.codes[cy, cx] = self.quantizer.quantize_tiles(self.tiles[cy, cx])
+
+    def write_tiles(self, x: int, y: int, tiles):
+        """
+        以 (x, y) 为左上角写入一块格子
+        :param tiles: (h, w) 紧凑格式数组
+        """
+        self._check_writable()
+        h, w = tiles.shape
+        self.tiles[y : y + h, x : x + w] = tiles
+
+        ys, xs = np.mgrid[y : y + h, x : x + w]
+        self._update_planes(xs.ravel(), ys.ravel())
+
+        self.notify(x, y, w, h)
+
+    def read_cells(self, xs, ys):
+        """
+        读取多个分散的格子
+        :param xs: 横坐标数组
+        :param ys: 纵坐标数组（与 xs 形状相同）
+        :return: 紧凑格式数组（新数组）
+        """
+        return self.tiles[np.asarray(ys), np.asarray(xs)]
+
+    def write_cells(self, xs, ys, tiles):
+        """
+        写入多个分散的格子（例如作物生长），只更新写入的格子，
+        监听器收到的是包含全部格子的矩形区域
+        :param xs: 横坐标数组
+        :param ys: 纵坐标数组（与 xs 形状相同）
+        :param tiles: 紧凑格式数组（与 xs 形状相同）
+        """
+        xs, ys = np.asarray(xs), np.asarray(ys)
+        if not xs.size:
+            return
+        self._check_writable()
+        self.tiles[ys, xs] = tiles
+        self._update_planes(xs.ravel(), ys.ravel())
+
+        x0, y0 = int(xs.min()), int(ys.min())
+        self.notify(
+            x0, y0, int(xs.max()) - x0 + 1, int(ys.max()) - y0 + 1, cells=(xs, ys)
+        )
+
+    def add_listener(self, callback):
+        """
+        注册地图修改监听器
+        :param callback: callback(x, y, w, h)，修改区域的左上角和宽高
+        """
+        self.listeners.append(callback)
+
+    def add_cell_listener(self, callback):
+        """
+        注册格子修改监听器，分散写入时给出实际修改的格子（例如存档记录修改过的区块）
+        :param callback: callback(x, y, w, h, cells)，cells 为 (xs, ys) 坐标数组，
+            矩形区域写入时为 None
+        """
+        self.cell_listeners.append(callback)
+
+    def notify(self, x: int, y: int, w: int, h: int, cells=None):
+        """
+        通知监听器地图区域已修改
+        :param cells: 可选，分散写入的 (xs, ys)，只传给格子修改监听器
+        """
+        for callback in self.listeners:
+            callback(x, y, w, h)
+        for callback in self.cell_listeners:
+            callback(x, y, w, h, cells)
+
+    def read_base(self, xs, ys):
+        """
+        读取基础地图（地图文件中的数据）中的多个格子，用于与当前地图比较
+        写时复制映射 ("c") 的修改只在内存中，地图文件保持原样
+        :return: 紧凑格式数组（新数组）
+        """
+        if self.base is None:
+            self.base = load_tiles(self.path, mmap_mode="r")
+        return self.base[np.asarray(ys), np.asarray(xs)]
+
+    def set_walkable(self, x: int, y: int, walkable: bool):
+        """修改单个格子的通行状态"""
+        tile = self.read_region(y, x, y + 1, x + 1).copy()
+        if walkable:
+            tile["flags"] |= WALKABLE
+        else:
+            tile["flags"] &= ~WALKABLE & 0xFF
+        self.write_tiles(x, y, tile)
+
+    def flush(self):
+        """将修改写回地图文件（仅 "r+" 映射有效）"""
+        if isinstance(self.tiles, np.memmap) and self.tiles.mode == "r+":
+            self.tiles.flush()
+
+    def close(self):
+        """关闭地图，写回未保存的修改"""
+        self.flush()
+
     def get_zone(self, start, end):
         """获取矩形区域对应的 numpy 切片"""
         y1, x1 = start
@@ -67,21 +297,18 @@ class World:
         xs = slice(min(x1, x2), max(x1, x2) + 1)
         return ys, xs
 
-    def get_viewport(
+    def get_view(
         self, center_x: int, center_y: int, view_w: int, view_h: int, cursor_pos=None
     ):
         """
-        获取以 (center_x, center_y) 为中心的地图视口（可显示在屏幕上）
+        获取以 (center_x, center_y) 为中心的地图视口（零拷贝）
 
         :param center_x: 中心 X 坐标
         :param center_y: 中心 Y 坐标
         :param view_w: 视口宽度（终端显示宽度）
         :param view_h: 视口高度（终端显示高度）
         :param cursor_pos: 可选，玩家位置 (y, x)，用于绘制 "@"
-        :return:
-            view_chars: list[list[str]] —— 字符矩阵
-            view_colors: list[list[tuple]] —— 每格颜色 (R,G,B)
-            left, top: 视口左上角地图坐标
+        :return: Viewport 对象，字符/颜色平面均为 tiles 的切片视图
         """
 
         # 限制视口范围不超过地图尺寸
@@ -101,23 +328,95 @@ class World:
         right = min(left + view_w, self.width)
         bottom = min(top + view_h, self.height)
 
-        view_chars = []
-        view_colors = []
-
-        # 遍历视口范围
-        for y in range(top, bottom):
-            row_chars = []
-            row_colors = []
-            for x in range(left, right):
-                # 将字符的 Unicode 数值转换为字符
-                c = chr(self.tiles[y, x, 0])
-                r, g, b = self.tiles[y, x, 3:6]
-                if cursor_pos and (y, x) == cursor_pos:
-                    c = "@"  # 玩家光标标记
-                    r, g, b = 255, 0, 0
-                row_chars.append(c)
-                row_colors.append((r, g, b))
-            view_chars.append(row_chars)
-            view_colors.append(row_colors)
+        # 直接切片，不复制数据
+        view = self.read_region(top, left, bottom, right)
+
+        # 玩家位置换算为视口内坐标
+        cursor = None
+        if cursor_pos:
+            cy, cx = cursor_pos[0] - top, cursor_pos[1] - left
+            if 0 <= cy < bottom - top and 0 <= cx < right - left:
+                cursor = (cy, cx)
+
+        codes = self.read_codes(top, left, bottom, right)
+        return Viewport(view, left, top, cursor, codes, self.quantizer)
 
+    def get_viewport(
+        self, center_x: int, center_y: int, view_w: int, view_h: int, cursor_pos=None
+    ):
+        """
+        获取视口的嵌套列表形式（兼容旧接口，新代码请使用 get_view）
+
+        :return:
+            view_chars: list[list[str]] —— 字符矩阵
+            view_colors: list[list[tuple]] —— 每格颜色 (R,G,B)
+        """
+        chars, colors = self.get_view(
+            center_x, center_y, view_w, view_h, cursor_pos
+        ).compose()
+
+        view_chars = [[chr(c) for c in row] for row in chars.tolist()]
+        view_colors = [
+            [
+                (c >> 16, (c >> 8) & 0xFF, c & 0xFF) if c != -1 else (-1, -1, -1)
+                for c in row
+            ]
+            for row in colors.tolist()
+        ]
         return view_chars, view_colors
+
+
+class Viewport:
+    """
+    视口数据
+    - tiles: (h, w) 视口范围内的格子，地图数组的切片视图
+    - chars: 字符平面（Unicode 整数），tiles 的视图
+    - left, top: 视口左上角地图坐标
+    - cursor: 玩家在视口内的坐标 (y, x)，不在视口内为 None
+    - codes: 预先量化的颜色代码平面（视图），quantizer 为对应的量化器，未量化为 None
+    """
+
+    # 玩家光标标记
+    CURSOR_CHAR = ord("@")
+    CURSOR_COLOR = 0xFF0000
+
+    def __init__(self, tiles, left, top, cursor=None, codes=None, quantizer=None):
+        self.tiles = tiles
+        self.left = left
+        self.top = top
+        self.cursor = cursor
+        self.codes = codes
+        self.quantizer = quantizer
+
+    @property
+    def shape(self):
+        """视口尺寸 (h, w)"""
+        return self.tiles.shape
+
+    @property
+    def chars(self):
+        """字符平面（视图）"""
+        return self.tiles["char"]
+
+    def compose(self, quantizer=None):
+        """
+        叠加玩家光标，得到最终显示的字符与颜色
+        只复制视口大小的数据，光标仅修改一个格子，地图本身不受影响
+        :param quantizer: 可选，颜色量化器；地图已按同一颜色深度量化时直接使用结果
+        :return: (chars, colors)，colors 为打包颜色 0xRRGGBB（或量化后的颜色代码），
+            透明为 -1
+        """
+        chars = self.chars.copy()
+        cursor_color = self.CURSOR_COLOR
+        if quantizer is None or quantizer.depth == "truecolor":
+            colors = pack_colors(self.tiles)
+        else:
+            if self.codes is not None and quantizer == self.quantizer:
+                colors = self.codes.astype(np.int32)
+            else:
+                colors = quantizer.quantize(pack_colors(self.tiles))
+            cursor_color = quantizer.quantize_one(cursor_color)
+        if self.cursor:
+            chars[self.cursor] = self.CURSOR_CHAR
+            colors[self.cursor] = cursor_color
+        return chars, colors
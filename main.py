@@ -1,151 +1,613 @@
 # main.py
+import sys
 import time
+import asyncio
+import argparse
+import signal
 import threading
 from pathlib import Path
 from blessed import Terminal
 from core.save import SaveData
+from core import savefile
+from core.dirty import DirtyFlag
+from core.snapshot import SnapshotBuffer
+from core.profiler import FrameProfiler
+from core.clock import SPEEDS, SimulationClock
 from core.player import Player
 from core.world import World
+from core.chunk import ChunkedWorld
+from core.crop import CropField
 from core.time import GameTime
+from core.replay import Recorder, Replay, ReplayClock, ReplayControl
 from translation import Translator
 from renderer.ascii_renderer import AsciiRenderer
+from renderer.headless_renderer import HeadlessRenderer, HeadlessTerminal
 from core.control import Control
-from core.save import SaveData
 
 # 游戏视口尺寸
 VIEW_W, VIEW_H = 0, 20
-# 存档路径
+# 存档路径（设置等），游戏状态与地图修改保存在二进制存档中
 SAVE_PATH = Path("save.json")
+SAVE_FILE = Path("save.tfs")
 
 
-def main():
-    # 初始化终端对象
-    term = Terminal()
+class Game:
+    """
+    游戏状态与逻辑
+    - 加载存档、地图、时间、渲染器
+    - apply：执行一个动作
+    - update_time：按模拟时钟推进游戏时间
+    - publish：状态变化后发布快照
+    - draw：渲染最新的快照（不需要锁）
+    运行方式（线程 / asyncio / 回放）见 run_threads / run_asyncio / run_replay
+    """
 
-    # 加载存档
-    save_data = SaveData.load(SAVE_PATH)
+    def __init__(
+        self, args, term, save_data=None, save_file=None, clock=time.monotonic
+    ):
+        """
+        :param args: 命令行参数
+        :param term: blessed.Terminal 对象（HeadlessTerminal 时使用无终端渲染器）
+        :param save_data: 可选，初始存档数据（回放），此时不读取也不写入存档文件
+        :param save_file: 可选，与 save_data 一起使用的二进制存档 (SaveFile)
+        :param clock: 模拟时钟使用的现实时间函数，回放时为 ReplayClock
+        """
+        self.term = term
 
-    # 初始化翻译器
-    translator = Translator(lang=save_data.settings["language"])
+        # 加载存档
+        self.save_path = None if save_data else SAVE_PATH
+        if save_data is None:
+            save_data = SaveData.load(SAVE_PATH)
+            if SAVE_FILE.exists():
+                try:
+                    save_file = savefile.SaveFile(SAVE_FILE)
+                except ValueError:
+                    # 无法识别的二进制存档，只使用 save.json
+                    save_file = None
+        self.save_data = save_data
 
-    # 游戏渲染帧率
-    fps = save_data.settings["fps"]
+        # 初始化翻译器
+        translator = Translator(lang=save_data.settings["language"])
 
-    # 加载地图
-    map_path = save_data.world
-    if not Path(map_path).exists():
-        map_path = f"map/{map_path}.npy"
-    world = World(map_path)
+        # 游戏渲染帧率
+        self.fps = save_data.settings["fps"]
 
-    # 加载游戏时间
-    game_time = GameTime(
-        save_data=save_data.time,
-        translator=translator,
-    )
+        # 加载地图（目录为分块地图）
+        map_path = save_data.world
+        if not Path(map_path).exists():
+            map_path = f"map/{map_path}"
+            if not Path(map_path).is_dir():
+                map_path += ".npy"
+        # 普通地图使用写时复制映射：作物等修改只在内存中，不写回地图文件
+        if Path(map_path).is_dir():
+            self.world = ChunkedWorld(map_path)
+        else:
+            self.world = World(map_path, mmap_mode="c")
+
+        # 二进制存档的基础地图不同时不使用
+        if save_file and not save_file.matches(self.world):
+            save_file = None
+        # 加载时的二进制存档（录制时写入录制文件）
+        self.save_file = save_file
+
+        # 加载游戏时间
+        self.game_time = GameTime(
+            save_data=save_file.time if save_file else save_data.time,
+            translator=translator,
+        )
+
+        # 作物，每个新的游戏日生长
+        self.crops = CropField(self.world)
+        self.game_time.add_system(self.crops)
+
+        # 地图修改记录（二进制存档只保存与地图文件不同的格子）
+        self.delta = savefile.WorldDelta(self.world)
+        if save_file:
+            self.crops.unpack(save_file.crops)
+            save_file.apply_delta(self.world)
+
+        # 从存档中加载玩家位置
+        player_pos = save_file.player if save_file else save_data.player
+        self.player = Player(x=player_pos.get("x"), y=player_pos.get("y"))
+
+        # 初始化渲染器
+        # 颜色深度 auto / truecolor / 256 / 16 / mono，auto 根据终端检测
+        color_depth = save_data.settings.get("color_depth", "auto")
+        if isinstance(term, HeadlessTerminal):
+            self.renderer = HeadlessRenderer(
+                width=term.width,
+                height=term.height,
+                term=term,
+                view_w=VIEW_W,
+                view_h=VIEW_H,
+                color_depth=color_depth,
+            )
+        else:
+            self.renderer = AsciiRenderer(
+                term=term, view_w=VIEW_W, view_h=VIEW_H, color_depth=color_depth
+            )
+        # 地图颜色按终端颜色深度预先量化
+        self.world.quantize(self.renderer.quantizer)
 
-    # 从存档中加载玩家位置
-    player_pos = save_data.player
-    player = Player(x=player_pos.get("x"), y=player_pos.get("y"))
+        self.running = True  # 游戏运行状态
+
+        # 模拟时钟：现实 1 秒 = 游戏 1 分钟（1x），P 暂停，[ ] 调整速度
+        self.sim_clock = SimulationClock(self.game_time, speed=args.speed, clock=clock)
+
+        # 性能分析（F3 切换叠加显示）
+        self.profiler = FrameProfiler(budget=1.0 / self.fps, log_path=args.profile)
+
+        # 帧失效标记：只有状态变化时才渲染
+        self.dirty = DirtyFlag()
+        self.world.add_listener(lambda *region: self.dirty.mark("world"))
+
+        # 每帧合并后的移动每个方向最多的格数
+        self.move_cap = args.move_cap
+
+        # 按键录制（--record）
+        self.recorder = None
+
+        # 调试信息
+        self.debug_info = "Welcome to the world!"
+
+        # 状态快照：模拟一侧修改状态后发布，渲染一侧只读取快照
+        self.snapshots = SnapshotBuffer()
+        self.publish()
+
+    def apply(self, action):
+        """
+        执行一个动作
+        :param action: 动作元组，例如 ("move", 1, 0)，None 表示无动作
+        """
+        if not action:
+            return
+        if action[0] == "move":
+            # 移动（同向连续的按键已合并为多格移动）
+            dx, dy = action[1], action[2]
+            if self.player.walk(dx, dy, self.world):
+                self.publish()
+                self.dirty.mark("player")
+        elif action[0] == "save":
+            # 保存
+            self.save()
+        elif action[0] == "quit":
+            # 退出
+            self.running = False
+            self.dirty.mark("quit")
+        elif action[0] == "pause":
+            # 暂停
+            self.sim_clock.toggle_pause()
+            self.game_time.debug_message = f"速度: {self.sim_clock.speed}"
+            self.publish()
+            self.dirty.mark("speed")
+        elif action[0] == "speed":
+            # 调整速度
+            self.sim_clock.cycle_speed(action[1])
+            self.game_time.debug_message = f"速度: {self.sim_clock.speed}"
+            self.publish()
+            self.dirty.mark("speed")
+        elif action[0] == "profile":
+            # 性能分析叠加显示
+            self.profiler.overlay = not self.profiler.overlay
+            self.dirty.mark("profile")
+
+    def apply_input(self, items):
+        """
+        执行 Control.take 取走的一批动作，并记录按键读取到执行完成的延迟
+        :param items: [(按键, 动作, 读取时间)]
+        """
+        for key, action, stamp in items:
+            if action:
+                self.apply(action)
+                self.profiler.record("input", time.perf_counter() - stamp)
 
-    # 初始化渲染器
-    renderer = AsciiRenderer(term=term, view_w=VIEW_W, view_h=VIEW_H)
+    def save(self):
+        """保存存档（回放时不保存）"""
+        if self.save_path is None:
+            self.debug_info = "回放中不保存"
+            self.publish()
+            return
+        save_data = self.save_data
+        save_data.player = {"x": self.player.x, "y": self.player.y}
+        save_data.world = self.world.name
+        save_data.time = self.game_time.to_dict()
+        # 只复制存档数据，序列化、比较地图与写入在后台线程完成（连续保存会合并）
+        save_data.save_async(self.save_path)
+        state = savefile.snapshot(
+            self.world, self.delta, self.player, self.game_time, self.crops
+        )
+        save_data.write_async(SAVE_FILE, state, savefile.encode)
+        self.debug_info = "保存中..."
+        self.publish()
+        self.dirty.mark("save")
+
+    def saved(self, duration: float, size: int, error):
+        """
+        后台保存完成（由 update_time 检查）
+        :param duration: 写入耗时（秒）
+        :param size: 写入字节数
+        :param error: 写入失败时的异常
+        """
+        if error:
+            self.debug_info = f"保存失败: {error}"
+        else:
+            self.profiler.record("save", duration)
+            self.debug_info = f"已保存 ({size / 1024:.1f} KB, {duration * 1000:.1f} ms)"
+        self.publish()
+        self.dirty.mark("save")
+
+    def update_time(self) -> float:
+        """
+        按模拟时钟推进游戏时间，并检查后台保存是否完成
+        :return: 距离下一步的秒数
+        """
+        start = time.perf_counter()
+        steps = self.sim_clock.update()
+        if steps:
+            self.publish()
+            self.profiler.record("tick", time.perf_counter() - start)
+            self.dirty.mark("time")
+
+        result = self.save_data.poll()
+        if result:
+            self.saved(*result)
+        return self.sim_clock.time_until_next()
+
+    def publish(self):
+        """
+        发布状态快照（在修改状态的一侧调用，线程运行方式下需持有 player_lock）
+        """
+        # 如果有新的游戏日，加入 debug 信息
+        if self.game_time.debug_message:
+            self.debug_info = self.game_time.debug_message
+            self.game_time.debug_message = ""  # 加入后清空
+
+        self.snapshots.publish(self.player, self.game_time, self.debug_info)
+
+    def draw(self, snapshot=None):
+        """
+        渲染一帧，不读取 Player / GameTime，也不需要持有锁
+        :param snapshot: 要渲染的快照，默认为最新的快照
+        """
+        if snapshot is None:
+            snapshot = self.snapshots.read()
+        self.renderer.draw(
+            self.world,  # 当前地图
+            snapshot.player,  # 玩家位置
+            snapshot.time,  # 游戏时间（HUD）
+            snapshot.debug_info,  # 调试信息显示
+        )
+
+    def close(self):
+        """等待后台保存完成，写回地图修改，关闭性能分析导出与录制"""
+        self.save_data.close()
+        self.world.close()
+        self.profiler.close()
+        if self.recorder:
+            self.recorder.close()
+
+
+def run_threads(game):
+    """
+    线程运行方式：时间线程、输入线程、主线程渲染
+    - 时间线程与输入线程修改状态时持有 player_lock，并发布快照
+    - 渲染线程只读取快照，不持有锁，终端输出慢时也不会阻塞输入与时间推进
+    """
+    term = game.term
+    profiler = game.profiler
 
     # 初始化控制器
-    control = Control(term=term)
+    control = Control(term=term, move_cap=game.move_cap, recorder=game.recorder)
 
     # 玩家位置锁
-    # 确保玩家位置和游戏状态在渲染和输入操作中不会冲突
+    # 确保输入与时间推进不会同时修改游戏状态（渲染不使用）
     player_lock = threading.Lock()
 
-    running = True  # 游戏运行状态
-    time_running = True  # 游戏时间流动
+    # 终端大小改变时全部重绘
+    if hasattr(signal, "SIGWINCH"):
+
+        def on_resize(signum, frame):
+            game.renderer.invalidate()
+            game.dirty.mark("resize")
+
+        signal.signal(signal.SIGWINCH, on_resize)
 
     # 时间推进线程
     def time_loop():
-        """后台线程，每秒推进游戏时间1分钟"""
-        nonlocal time_running
-        while running:
-            if time_running:
-                with player_lock:
-                    # 每秒游戏时间推进1分钟
-                    game_time.tick(minutes=1)
-            time.sleep(1)
+        """后台线程，按模拟时钟推进游戏时间"""
+        while game.running:
+            with player_lock:
+                wait = game.update_time()
+            # 最多等待 0.1 秒，及时响应速度调整和退出；max 速度也让出锁给其他线程
+            time.sleep(min(max(wait, 0.001), 0.1))
 
     time_thread = threading.Thread(target=time_loop, daemon=True)
     time_thread.start()
 
     # 输入处理线程
     def input_loop():
-        """后台线程，监听键盘输入并执行动作"""
-        nonlocal running, time_running
-        while running:
-            # 获取键盘动作 (key, action)
-            item = control.get_action()
-            if not item:
-                time.sleep(0.01)
+        """后台线程，有按键时立即唤醒并执行动作"""
+        frame_time = 1.0 / game.fps
+        # 上一批动作的执行时间
+        last_input = 0.0
+        while game.running:
+            # 每帧最多执行一批：距上一批不足一帧时只等待剩余时间，
+            # 这段时间内到达的同向移动合并（与 asyncio 运行时的 call_later 相同）
+            wait = last_input + frame_time - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+
+            # 等待按键（最多 0.1 秒，及时响应退出）
+            items = control.take(timeout=0.1)
+            if not items:
                 continue
 
-            key, action = item
-
-            if action:
-                with player_lock:
-                    if action[0] == "move":
-                        # 移动
-                        dx, dy = action[1], action[2]
-                        player.move(dx, dy, world)
-                    elif action[0] == "save":
-                        # 保存
-                        save_data.player = {"x": player.x, "y": player.y}
-                        save_data.world = world.name
-                        save_data.time = game_time.to_dict()
-                        save_data.save(SAVE_PATH)
-                    elif action[0] == "quit":
-                        # 退出
-                        running = False
-                    elif action[0] == "pause":
-                        # 暂停
-                        time_running = not time_running
+            with player_lock:
+                game.apply_input(items)
+            last_input = time.monotonic()
 
     input_thread = threading.Thread(target=input_loop, daemon=True)
     input_thread.start()
 
     # 主渲染循环
     try:
-        # 使用上下文管理器进入全屏模式并隐藏光标
-        with term.fullscreen(), term.hidden_cursor():
-            # 计算每帧的时间间隔（秒）
-            frame_time = 1.0 / fps
-
-            # 准备调试信息列表
-            debug_info = "Welcome to the world!"
-            while running:
-                # 记录帧开始时间
-                start_time = time.time()
-                # 渲染和玩家状态同步
-                with player_lock:
-
-                    # 如果有新的游戏日，加入 debug 信息
-                    if game_time.debug_message:
-                        debug_info = game_time.debug_message
-                        game_time.debug_message = ""  # 加入后清空
-
-                    renderer.draw(
-                        world,  # 当前地图
-                        player,  # 玩家对象
-                        game_time,  # 游戏时间
-                        debug_info,  # 调试信息显示
-                    )
-
-                # 计算渲染耗时
-                elapsed = time.time() - start_time
-                # 计算剩余休眠时间，保证帧率接近 fps
-                sleep_time = max(0, frame_time - elapsed)
-                # 等待剩余时间后进入下一帧
+        # 计算每帧的时间间隔（秒）
+        frame_time = 1.0 / game.fps
+
+        # 上一帧的绘制时间
+        last_frame = 0.0
+        game.dirty.mark("start")
+        while game.running:
+            # 休眠直到有状态变化（定时醒来检查退出，显示性能分析时每秒刷新）
+            if not game.dirty.wait(timeout=1.0) and not profiler.overlay:
+                continue
+            if not game.running:
+                break
+
+            # 距上一帧不足一帧时间则等待，合并这段时间内的变化
+            sleep_time = last_frame + frame_time - time.monotonic()
+            if sleep_time > 0:
                 time.sleep(sleep_time)
+            game.dirty.wait(timeout=0)
+
+            # 性能分析叠加显示（截至上一帧的统计）
+            game.renderer.overlay = profiler.overlay_lines() if profiler.overlay else []
+
+            # 记录帧开始时间
+            last_frame = time.monotonic()
+            start = time.perf_counter()
+            # 渲染读取快照，不等待 player_lock
+            snapshot = game.snapshots.read()
+            profiler.record("lock", time.perf_counter() - start)
+            game.draw(snapshot)
+            profiler.end_frame(time.perf_counter() - start, game.renderer.stage_times)
     finally:
         # 停止控制器线程
         control.stop()
 
 
+async def run_asyncio(game):
+    """
+    asyncio 运行方式：所有状态只在事件循环中修改，不需要锁
+    - 终端输入：事件循环监听 stdin 可读，立即读取；每帧最多执行一批，连续的移动合并
+    - 时间推进、渲染：两个协程
+    """
+    term = game.term
+    profiler = game.profiler
+    loop = asyncio.get_running_loop()
+    control = Control(
+        term=term, threaded=False, move_cap=game.move_cap, recorder=game.recorder
+    )
+    game.dirty.attach(loop)
+
+    frame_time = 1.0 / game.fps
+    # 上一次执行输入的时间 (loop.time())，以及已安排的下一次执行
+    last_input = 0.0
+    apply_handle = None
+
+    def apply_input():
+        """执行全部待执行动作"""
+        nonlocal last_input, apply_handle
+        apply_handle = None
+        last_input = loop.time()
+        game.apply_input(control.take())
+
+    def on_input():
+        """stdin 可读：读取全部已到达的按键，距上一批不足一帧时推迟执行"""
+        nonlocal apply_handle
+        stamp = time.perf_counter()
+        key = term.inkey(timeout=0)
+        while key:
+            control.push(key, stamp)
+            key = term.inkey(timeout=0)
+        if apply_handle is None:
+            delay = max(0.0, last_input + frame_time - loop.time())
+            apply_handle = loop.call_later(delay, apply_input)
+
+    async def time_task():
+        """按模拟时钟推进游戏时间"""
+        while game.running:
+            wait = game.update_time()
+            # 最多等待 0.1 秒，及时响应速度调整；max 速度也让出事件循环
+            await asyncio.sleep(min(max(wait, 0.001), 0.1))
+
+    async def render_task():
+        """有状态变化时渲染"""
+        last_frame = 0.0
+        game.dirty.mark("start")
+        while game.running:
+            reasons = await game.dirty.wait_async(timeout=1.0)
+            if not reasons and not profiler.overlay:
+                continue
+            if not game.running:
+                break
+
+            # 距上一帧不足一帧时间则等待，合并这段时间内的变化
+            sleep_time = last_frame + frame_time - time.monotonic()
+            if sleep_time > 0:
+                await asyncio.sleep(sleep_time)
+
+            game.renderer.overlay = profiler.overlay_lines() if profiler.overlay else []
+            last_frame = time.monotonic()
+            start = time.perf_counter()
+            game.draw()
+            profiler.end_frame(time.perf_counter() - start, game.renderer.stage_times)
+
+    def on_resize():
+        game.renderer.invalidate()
+        game.dirty.mark("resize")
+
+    fd = sys.stdin.fileno()
+    with term.cbreak():
+        loop.add_reader(fd, on_input)
+        if hasattr(signal, "SIGWINCH"):
+            loop.add_signal_handler(signal.SIGWINCH, on_resize)
+        ticker = asyncio.create_task(time_task())
+        try:
+            await render_task()
+        finally:
+            ticker.cancel()
+            loop.remove_reader(fd)
+            if hasattr(signal, "SIGWINCH"):
+                loop.remove_signal_handler(signal.SIGWINCH)
+
+
+def run_replay(game, control, fast=False):
+    """
+    回放运行方式（单线程）：按帧推进虚拟时间，执行到期的按键，有变化时渲染
+    :param control: ReplayControl 对象
+    :param fast: True 时不等待现实时间，尽快回放
+    :return: (模拟帧数, 渲染帧数, 用时秒数)
+    """
+    profiler = game.profiler
+    clock = game.sim_clock.clock
+    frame_time = 1.0 / game.fps
+
+    frames = drawn = 0
+    start = time.monotonic()
+    game.dirty.mark("start")
+    while game.running and clock.now < control.duration:
+        frames += 1
+        clock.now = frames * frame_time
+        if not fast:
+            sleep_time = start + clock.now - time.monotonic()
+            if sleep_time > 0:
+                time.sleep(sleep_time)
+
+        game.update_time()
+        control.feed(clock.now)
+        game.apply_input(control.take())
+        if not game.dirty.wait(timeout=0) and not profiler.overlay:
+            continue
+
+        game.renderer.overlay = profiler.overlay_lines() if profiler.overlay else []
+        draw_start = time.perf_counter()
+        game.draw()
+        profiler.end_frame(time.perf_counter() - draw_start, game.renderer.stage_times)
+        drawn += 1
+    return frames, drawn, time.monotonic() - start
+
+
+def main():
+    # 命令行参数
+    parser = argparse.ArgumentParser(description="Terminal Farm")
+    parser.add_argument(
+        "--profile", metavar="PATH", help="性能分析数据导出文件 (JSON lines)"
+    )
+    parser.add_argument(
+        "--speed", choices=list(SPEEDS), default="1x", help="游戏时间速度"
+    )
+    parser.add_argument(
+        "--move-cap",
+        type=int,
+        default=Control.MOVE_CAP,
+        help="每帧同向连续移动合并后最多的格数（至少 1）",
+    )
+    parser.add_argument(
+        "--asyncio",
+        action="store_true",
+        help="使用 asyncio 事件循环运行（单线程，无锁）",
+    )
+    parser.add_argument("--record", metavar="PATH", help="录制按键到文件 (JSON lines)")
+    parser.add_argument("--replay", metavar="PATH", help="回放录制的按键")
+    parser.add_argument(
+        "--fast", action="store_true", help="回放时不等待现实时间，尽快回放"
+    )
+    parser.add_argument(
+        "--headless",
+        metavar="WxH",
+        nargs="?",
+        const="120x40",
+        help="回放时使用固定大小的虚拟终端（默认 120x40），不输出到终端",
+    )
+    args = parser.parse_args()
+    if (args.fast or args.headless) and not args.replay:
+        parser.error("--fast / --headless 需要同时使用 --replay")
+    if args.move_cap < 1:
+        parser.error("--move-cap 必须至少为 1")
+
+    # 回放：从录制开始时的存档与参数开始，使用虚拟时钟
+    replay = Replay.load(args.replay) if args.replay else None
+    if replay:
+        args.speed = replay.header.get("speed", args.speed)
+        args.move_cap = replay.header.get("move_cap", args.move_cap)
+
+    # 初始化终端对象
+    if args.headless:
+        width, height = (int(n) for n in args.headless.lower().split("x"))
+        term = HeadlessTerminal(width, height)
+    else:
+        term = Terminal()
+    if replay:
+        game = Game(
+            args,
+            term,
+            save_data=replay.save_data,
+            save_file=replay.save_file,
+            clock=ReplayClock(),
+        )
+    else:
+        game = Game(args, term)
+    if args.record and not replay:
+        game.recorder = Recorder(
+            args.record,
+            game.save_data,
+            save_file=game.save_file,
+            speed=args.speed,
+            move_cap=args.move_cap,
+        )
+
+    result = None
+    try:
+        # 使用上下文管理器进入全屏模式并隐藏光标
+        with term.fullscreen(), term.hidden_cursor():
+            if replay:
+                control = ReplayControl(replay, term=term)
+                result = run_replay(game, control, fast=args.fast)
+            elif args.asyncio:
+                asyncio.run(run_asyncio(game))
+            else:
+                run_threads(game)
+    finally:
+        # 写回地图修改
+        game.close()
+
+    if result:
+        # 回放统计
+        frames, drawn, elapsed = result
+        print(
+            f"回放 {frames} 帧（渲染 {drawn} 帧），用时 {elapsed:.3f} 秒，"
+            f"{frames / max(elapsed, 1e-9):.0f} 帧/秒"
+        )
+        print(
+            f"结束状态: 玩家 ({game.player.x}, {game.player.y})，"
+            f"{game.game_time.hud()[0]}"
+        )
+        stats = game.profiler.stats("frame")
+        if stats:
+            p50, p95, p99 = stats
+            print(f"帧耗时 p50 / p95 / p99: {p50:.3f} / {p95:.3f} / {p99:.3f} ms")
+
+
 if __name__ == "__main__":
     main()
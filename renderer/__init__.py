@@ -1 +1,3 @@
-from .ascii_renderer import AsciiRenderer
\ No newline at end of file
+from .interface import Renderer
+from .ascii_renderer import AsciiRenderer
+from .headless_renderer import HeadlessRenderer, HeadlessTerminal
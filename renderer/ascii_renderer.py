@@ -1,27 +1,234 @@
 # renderer/ascii_renderer.py
 # ASCII 渲染器
 
+import io
+import time
+import numpy as np
 from blessed import Terminal
-from wcwidth import wcswidth
+from .interface import Renderer
+from .palette import COLOR_DEPTHS, Quantizer, detect_depth
 
 
-class AsciiRenderer:
-    def __init__(self, term=None, view_w=0, view_h=20, color=True):
+class AsciiRenderer(Renderer):
+    # 同步更新（终端收到结束序列后一次性显示整帧，避免撕裂），不支持的终端会忽略
+    SYNC_BEGIN = "\x1b[?2026h"
+    SYNC_END = "\x1b[?2026l"
+
+    # 视口第一行所在的终端行
+    START_Y = 2
+
+    def __init__(
+        self,
+        term=None,
+        view_w=0,
+        view_h=20,
+        color=True,
+        sync=True,
+        scroll=True,
+        color_depth="auto",
+    ):
         """
         初始化 ASCII 渲染器
         :param term: blessed.Terminal 对象，用于终端控制
         :param view_w: 视口宽度，0 表示自动适配终端宽度
         :param view_h: 视口高度，0 表示自动适配终端高度
         :param color: 是否显示颜色
+        :param sync: 是否使用同步更新序列包裹每一帧
+        :param scroll: 视口平移时是否使用终端滚动移动已有内容
+        :param color_depth: 颜色深度 auto / truecolor / 256 / 16 / mono，
+            auto 根据终端支持的颜色数选择，不支持的值按 auto 处理
         """
 
         self.term = term if term else Terminal()
         self.view_w = view_w
         self.view_h = view_h
         self.color = color
+        self.sync = sync
+        self.scroll = scroll
+
+        # 颜色量化器：低于真彩色时颜色以调色板索引表示，输出更短的转义序列
+        # 存档中可能写成数字（例如 256），统一转为字符串
+        color_depth = str(color_depth)
+        if color_depth not in COLOR_DEPTHS:
+            color_depth = "auto"
+        if color_depth == "auto":
+            color_depth = detect_depth(self.term)
+        self.quantizer = Quantizer(color_depth)
+
+        # 帧缓冲：整帧内容先写入这里，最后一次性输出
+        self.frame = io.StringIO()
+        # 上一帧输出的字节数、累计输出字节数
+        self.bytes_written = 0
+        self.total_bytes = 0
+
+        # 前缓冲：终端上当前显示的内容（字符编码、颜色代码），用于双缓冲比较
+        self.front_chars = np.zeros((0, 0), dtype=np.uint32)
+        self.front_colors = np.zeros((0, 0), dtype=np.int32)
+        # 前缓冲对应的视口左上角地图坐标 (left, top)
+        self.front_origin = None
+        # 下一帧先清屏（外部要求全部重绘时）
+        self.clear_screen = False
+        # 已显示的 HUD（时间行）版本与终端宽度，未变化时跳过该行
+        self.hud_key = None
+
+        # 底部叠加显示的文本行（例如性能分析），以及上一帧占用的行数
+        self.overlay = []
+        self.overlay_rows = 0
+        # 上一帧各阶段耗时（秒）{viewport, diff, escape, write}
+        self.stage_times = {}
+
+        # 颜色转义序列缓存 {颜色代码: str}
+        # 地图通常只有少量颜色，每种颜色只经过一次 blessed 的格式化
+        self.palette = {}
+        self.reset = str(self.term.normal)
+
+    def invalidate(self, shape=None):
+        """
+        清空前缓冲，下一帧全部重绘
+        :param shape: 新的视口尺寸 (h, w)，默认保持不变
+        """
+        if shape is None:
+            # 外部要求重绘（例如终端大小改变），屏幕内容已不可信
+            shape = self.front_chars.shape
+            self.clear_screen = True
+        # -2 不是合法颜色，所有格子都会被视为变化
+        self.front_chars = np.zeros(shape, dtype=np.uint32)
+        self.front_colors = np.full(shape, -2, dtype=np.int32)
+        self.front_origin = None
+        self.hud_key = None
+
+    @staticmethod
+    def shifted(front, dx: int, dy: int, fill):
+        """
+        前缓冲内容平移 (dx, dy) 后的结果，与终端滚动后的屏幕一致
+        新位置 (y, x) 显示原来 (y + dy, x + dx) 的内容，移入的部分为 fill
+        """
+        h, w = front.shape
+        out = np.full_like(front, fill)
+        if abs(dx) < w and abs(dy) < h:
+            out[max(0, -dy) : h - max(0, dy), max(0, -dx) : w - max(0, dx)] = front[
+                max(0, dy) : h - max(0, -dy), max(0, dx) : w - max(0, -dx)
+            ]
+        return out
+
+    def scroll_view(self, chars, colors, origin) -> str:
+        """
+        视口平移少量格子时，用终端滚动移动屏幕上已有的内容，
+        之后只需重绘新露出的区域和变化的格子
+        - 纵向：设置滚动区域为视口所在行，DL/IL 删除/插入行
+        - 横向：逐行 DCH/ICH 删除/插入字符（仅视口占满终端宽度时）
+        :param origin: 新视口左上角 (left, top)
+        :return: 滚动所需的转义序列，不适合滚动时返回空字符串
+        """
+        if not self.scroll or self.front_origin is None:
+            return ""
+        dx = origin[0] - self.front_origin[0]
+        dy = origin[1] - self.front_origin[1]
+        h, w = chars.shape
+        if not (dx or dy) or abs(dx) * 2 >= w or abs(dy) * 2 >= h:
+            return ""
+        # 横向插入/删除字符会影响视口右侧的内容
+        if dx and w != self.term.width:
+            return ""
+
+        new_chars = self.shifted(self.front_chars, dx, dy, 0)
+        new_colors = self.shifted(self.front_colors, dx, dy, -2)
+
+        # 滚动后需要重绘的格子明显更少才滚动
+        before = np.count_nonzero(
+            (chars != self.front_chars) | (colors != self.front_colors)
+        )
+        after = np.count_nonzero((chars != new_chars) | (colors != new_colors))
+        if after * 2 > before:
+            return ""
+
+        out = [self.reset]
+        top, bottom = self.START_Y, self.START_Y + h - 1
+        if dy:
+            # DECSTBM 设置滚动区域（1 起始），在区域首行 DL 删除行使内容上移、
+            # IL 插入行使内容下移，区域外的行不受影响，最后恢复整屏
+            out.append(f"\x1b[{top + 1};{bottom + 1}r")
+            out.append(self.term.move(top, 0))
+            out.append(f"\x1b[{dy}M" if dy > 0 else f"\x1b[{-dy}L")
+            out.append("\x1b[r")
+        if dx:
+            # DCH 删除行首字符使内容左移，ICH 插入空白使内容右移
+            seq = f"\x1b[{dx}P" if dx > 0 else f"\x1b[{-dx}@"
+            for y in range(top, bottom + 1):
+                out.append(self.term.move(y, 0) + seq)
+
+        self.front_chars = new_chars
+        self.front_colors = new_colors
+        return "".join(out)
+
+    def diff(self, chars, colors):
+        """
+        比较新帧与前缓冲，找出每行变化的连续区段，并更新前缓冲
+        :param chars: (h, w) 字符编码
+        :param colors: (h, w) 颜色代码
+        :return: [(y, x0, x1)]，区段为 [x0, x1)
+        """
+        dirty = (chars != self.front_chars) | (colors != self.front_colors)
+        if not dirty.any():
+            return []
+
+        # 每行两端补 0 后做差分，+1 为区段起点，-1 为区段终点
+        # np.nonzero 按行优先返回，起点与终点一一对应
+        h = dirty.shape[0]
+        edges = np.diff(
+            np.concatenate(
+                [
+                    np.zeros((h, 1), np.int8),
+                    dirty.view(np.int8),
+                    np.zeros((h, 1), np.int8),
+                ],
+                axis=1,
+            ),
+            axis=1,
+        )
+        ys, starts = np.nonzero(edges == 1)
+        _, ends = np.nonzero(edges == -1)
+
+        self.front_chars[...] = chars
+        self.front_colors[...] = colors
+        return zip(ys.tolist(), starts.tolist(), ends.tolist())
+
+    def color_code(self, color: int) -> str:
+        """
+        获取颜色代码对应的前景色转义序列
+        :param color: 真彩色为 0xRRGGBB，256 / 16 色为调色板索引，-1 表示透明（恢复默认颜色）
+        """
+        code = self.palette.get(color)
+        if code is None:
+            if color == -1:
+                code = self.reset
+            elif self.quantizer.depth == "truecolor":
+                r, g, b = color >> 16, (color >> 8) & 0xFF, color & 0xFF
+                code = str(self.term.color_rgb(r, g, b))
+            else:
+                code = str(self.term.color(color))
+            self.palette[color] = code
+        return code
+
+    def render_cells(self, cells) -> str:
+        """
+        将一段连续的格子转为输出字符串
+        相邻格子颜色相同时不重复输出颜色序列
+        :param cells: 可迭代的 (字符编码, 颜色代码)
+        """
+        if not self.color:
+            return "".join([chr(code) for code, _ in cells])
 
-        # 上一帧内容缓存 [(char, (r,g,b))] 用于双缓冲优化
-        self.prev_buffer = []
+        out = []
+        current = -1  # 每段开始时终端处于默认颜色
+        for code, color in cells:
+            if color != current:
+                out.append(self.color_code(color))
+                current = color
+            out.append(chr(code))
+        if current != -1:
+            out.append(self.reset)
+        return "".join(out)
 
     def draw(self, world, player, game_time=None, debug_info=None):
         """
@@ -33,6 +240,8 @@ class AsciiRenderer:
         """
 
         term = self.term
+        clock = time.perf_counter
+        t0 = clock()
 
         # 自动调整视口大小
         view_w = self.view_w if self.view_w > 0 else term.width
@@ -48,82 +257,107 @@ class AsciiRenderer:
                 else world.height
             )
 
-        # 获取视口
-        chars, colors = world.get_viewport(
+        # 获取视口（数组形式）
+        view = world.get_view(
             player.x, player.y, view_w, view_h, cursor_pos=(player.y, player.x)
         )
+        # 颜色为打包整数 0xRRGGBB（或量化后的调色板索引），透明为 -1，便于整行比较
+        chars, packed = view.compose(self.quantizer)
+        t1 = clock()
 
         # 获取实际视口尺寸（防止越界）
-        actual_h = len(chars)
-        actual_w = len(chars[0]) if actual_h > 0 else 0
-
-        # 初始化 prev_buffer，如果大小不匹配则重建
-        if len(self.prev_buffer) != actual_h or any(
-            len(row) != actual_w for row in self.prev_buffer
-        ):
-            self.prev_buffer = [
-                [("", (-1, -1, -1)) for _ in range(actual_w)] for _ in range(actual_h)
-            ]
+        actual_h, actual_w = chars.shape
+
+        # 大小不匹配则重建前缓冲（全部重绘）
+        if self.front_chars.shape != chars.shape:
+            self.invalidate(chars.shape)
 
-        # 清空首行内容
-        print(term.move(0, 0) + term.clear_eol, end="")
-
-        # 打印游戏时间
-        if game_time:
-            time_text = f"{game_time.get_date_text()} ({game_time.get_week_text()}) {game_time.get_time_text()}"
-            right_x = max(0, term.width - wcswidth(time_text) - 1)
-            print(term.move(0, right_x) + time_text, end="")
-
-        # 双缓冲渲染
-        # 遍历每个格子，只刷新有变化的部分
-        start_y = 2  # 第2行开始
-        for y in range(actual_h):
-            row_changes = []
-            x = 0
-            while x < actual_w:
-                start_x = x
-                # 找连续变化区
-                while x < actual_w and self.prev_buffer[y][x] != (
-                    chars[y][x],
-                    colors[y][x],
-                ):
-                    x += 1
-                end_x = x
-
-                if start_x < end_x:
-                    # 有变化区
-                    segment = ""
-                    for i in range(start_x, end_x):
-                        char = chars[y][i]
-                        r, g, b = colors[y][i]
-                        if self.color and r != -1:
-                            segment += term.color_rgb(r, g, b)(char)
-                        else:
-                            segment += char
-                    row_changes.append((start_x, segment))
-                    for i in range(start_x, end_x):
-                        self.prev_buffer[y][i] = (chars[y][i], colors[y][i])
-                else:
-                    # 没变化则跳过
-                    x += 1
-
-            # 合并输出一次
-            if row_changes:
-                out = []
-                for start_x, seg in row_changes:
-                    out.append(term.move(start_y + y, start_x) + seg)
-                print("".join(out), end="")
+        # 重置帧缓冲
+        frame = self.frame
+        frame.seek(0)
+        frame.truncate()
+        if self.sync:
+            frame.write(self.SYNC_BEGIN)
+        if self.clear_screen:
+            frame.write(term.clear)
+            self.clear_screen = False
+
+        # 视口平移时先滚动已有内容，然后比较得到需要重绘的区段
+        origin = (view.left, view.top)
+        frame.write(self.scroll_view(chars, packed, origin))
+        self.front_origin = origin
+        runs = self.diff(chars, packed)
+        t2 = clock()
+
+        # 打印游戏时间（HUD 文本由 GameTime 缓存，版本未变时整行跳过）
+        hud_key = (game_time.hud_version, term.width) if game_time else None
+        if hud_key is None or hud_key != self.hud_key:
+            # 清空首行内容
+            self.write_text(0, 0, "", clear=True)
+            if game_time:
+                time_text, text_width, _ = game_time.hud()
+                right_x = max(0, term.width - text_width - 1)
+                self.write_text(0, right_x, time_text)
+            self.hud_key = hud_key
+
+        # 双缓冲渲染，只刷新有变化的连续区段
+        start_y = self.START_Y  # 第2行开始
+        for y, x0, x1 in runs:
+            cells = zip(chars[y, x0:x1].tolist(), packed[y, x0:x1].tolist())
+            frame.write(term.move(start_y + y, x0) + self.render_cells(cells))
+        t3 = clock()
 
         # 打印调试信息
         info_y = start_y + actual_h + 1
         if debug_info:
             # 清空该行再打印
-            print(term.move(info_y, 0) + " " * term.width, end="")
-            print(term.move(info_y, 0) + debug_info)
+            self.write_text(info_y, 0, debug_info, clear=True)
             info_y += 1
 
         # 底部提示
-        print(
-            term.move(info_y, 0) + term.clear_eol + "Ctrl+W 保存 / Ctrl+X 退出",
-            end="",
-        )
+        self.write_text(info_y, 0, "Ctrl+W 保存 / Ctrl+X 退出", clear=True)
+
+        # 叠加显示，超出终端的行不显示；关闭后清除上一帧占用的行
+        rows = max(0, min(len(self.overlay), term.height - info_y - 1))
+        for i in range(max(rows, self.overlay_rows)):
+            text = self.overlay[i] if i < rows else ""
+            self.write_text(info_y + 1 + i, 0, text, clear=True)
+        self.overlay_rows = rows
+
+        if self.sync:
+            frame.write(self.SYNC_END)
+        t4 = clock()
+        self.flush_frame()
+
+        self.stage_times = {
+            "viewport": t1 - t0,
+            "diff": t2 - t1,
+            "escape": t3 - t2,
+            "write": clock() - t4,
+        }
+
+    def write_text(self, row: int, col: int, text: str, clear: bool = False):
+        """
+        在终端 (row, col) 处输出文本（写入帧缓冲）
+        :param clear: 是否先清除从 col 到行尾的内容
+        """
+        clear_eol = self.term.clear_eol if clear else ""
+        self.frame.write(self.term.move(row, col) + clear_eol + text)
+
+    def flush_frame(self):
+        """将帧缓冲一次性写入终端（一次 write + 一次 flush）"""
+        text = self.frame.getvalue()
+        data = text.encode("utf-8")
+        stream = self.term.stream
+        buffer = getattr(stream, "buffer", None)
+        if buffer is not None:
+            # 直接写入底层字节流，跳过文本层
+            stream.flush()
+            buffer.write(data)
+            buffer.flush()
+        else:
+            stream.write(text)
+            stream.flush()
+
+        self.bytes_written = len(data)
+        self.total_bytes += len(data)
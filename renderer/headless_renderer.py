@@ -0,0 +1,129 @@
+# renderer/headless_renderer.py
+# 无终端渲染器
+
+import io
+
+import numpy as np
+from blessed import Terminal
+from wcwidth import wcwidth
+
+from .ascii_renderer import AsciiRenderer
+
+
+class HeadlessTerminal(Terminal):
+    """
+    固定大小的虚拟终端
+    - 不连接 TTY，输出写入内存
+    - 始终生成转义序列，与真实终端的输出一致
+    """
+
+    def __init__(self, width=80, height=24, colors=1 << 24, kind="xterm-256color"):
+        """
+        :param width: 终端列数
+        :param height: 终端行数
+        :param colors: 颜色数（1 << 24 真彩色 / 256 / 16 / 0）
+        :param kind: terminfo 类型
+        """
+        super().__init__(kind=kind, stream=io.StringIO(), force_styling=True)
+        self._fixed_width = width
+        self._fixed_height = height
+        self.number_of_colors = colors
+
+    @property
+    def width(self):
+        return self._fixed_width
+
+    @property
+    def height(self):
+        return self._fixed_height
+
+    def resize(self, width, height):
+        """模拟终端大小改变"""
+        self._fixed_width = width
+        self._fixed_height = height
+
+
+class HeadlessRenderer(AsciiRenderer):
+    """
+    无终端渲染器
+    - 与 AsciiRenderer 使用完全相同的渲染流程（视口提取、双缓冲比较、HUD）
+    - 每帧结果保存为内存中的格子矩阵 screen_chars / screen_colors
+    - 可选保留输出的转义序列字节流 output，用于统计或回放
+    用于基准测试、回归测试，以及在没有终端的环境中运行游戏主循环
+    """
+
+    def __init__(self, width=80, height=24, capture=False, **kwargs):
+        """
+        :param width: 虚拟终端列数
+        :param height: 虚拟终端行数
+        :param capture: 是否保留输出的转义序列
+        :param kwargs: 其余参数传给 AsciiRenderer（view_w / view_h / color / scroll 等）
+        """
+        term = kwargs.pop("term", None) or HeadlessTerminal(width, height)
+        super().__init__(term=term, **kwargs)
+        self.capture = capture
+        self.frames = 0
+
+        # 屏幕格子：字符编码（0 表示宽字符占用的第二格）、颜色代码（-1 默认颜色）
+        self.screen_chars = np.full((height, width), ord(" "), dtype=np.uint32)
+        self.screen_colors = np.full((height, width), -1, dtype=np.int32)
+
+    def draw(self, world, player, game_time=None, debug_info=None):
+        """渲染一帧（虚拟终端大小改变时重建屏幕格子）"""
+        shape = (self.term.height, self.term.width)
+        if self.screen_chars.shape != shape:
+            self.screen_chars = np.full(shape, ord(" "), dtype=np.uint32)
+            self.screen_colors = np.full(shape, -1, dtype=np.int32)
+            self.invalidate()
+        super().draw(world, player, game_time, debug_info)
+
+    @property
+    def output(self) -> str:
+        """累计输出的转义序列（capture=True 时有效）"""
+        return self.term.stream.getvalue()
+
+    def write_text(self, row: int, col: int, text: str, clear: bool = False):
+        """输出文本，同时写入屏幕格子"""
+        super().write_text(row, col, text, clear)
+        if not 0 <= row < self.term.height:
+            return
+        if clear:
+            self.screen_chars[row, col:] = ord(" ")
+            self.screen_colors[row, col:] = -1
+        x = col
+        for ch in text:
+            w = max(wcwidth(ch), 1)
+            if x + w > self.term.width:
+                break
+            self.screen_chars[row, x] = ord(ch)
+            self.screen_colors[row, x] = -1
+            if w == 2:
+                self.screen_chars[row, x + 1] = 0
+            x += w
+
+    def flush_frame(self):
+        """输出一帧，并把视口前缓冲同步到屏幕格子"""
+        h, w = self.front_chars.shape
+        h = min(h, self.term.height - self.START_Y)
+        w = min(w, self.term.width)
+        if h > 0 and w > 0:
+            rows = slice(self.START_Y, self.START_Y + h)
+            self.screen_chars[rows, :w] = self.front_chars[:h, :w]
+            self.screen_colors[rows, :w] = self.front_colors[:h, :w]
+
+        super().flush_frame()
+        self.frames += 1
+        if not self.capture:
+            self.term.stream.seek(0)
+            self.term.stream.truncate()
+
+    def screen_text(self):
+        """屏幕内容，每行一个字符串"""
+        return ["".join(chr(c) for c in row if c) for row in self.screen_chars.tolist()]
+
+    def cell(self, x: int, y: int):
+        """
+        获取屏幕上单个格子
+        :return: (字符, 颜色代码)
+        """
+        return chr(self.screen_chars[y, x]), int(self.screen_colors[y, x])
@@ -0,0 +1,26 @@
+# renderer/interface.py
+# 抽象渲染接口
+
+from abc import ABC, abstractmethod
+
+
+class Renderer(ABC):
+    """
+    抽象渲染接口
+    所有渲染后端（blessed 终端、无终端、SDL 等）实现相同的方法，
+    游戏主循环只依赖这里定义的接口。
+    """
+
+    @abstractmethod
+    def draw(self, world, player, game_time=None, debug_info=None):
+        """
+        渲染一帧
+        :param world: World 对象，提供地图数据
+        :param player: Player 对象，提供玩家位置
+        :param game_time: GameTime 对象，可选，用于显示游戏时间
+        :param debug_info: 可选，显示调试信息
+        """
+
+    @abstractmethod
+    def invalidate(self, shape=None):
+        """丢弃已显示内容的缓存，下一帧全部重绘（例如终端大小改变后）"""
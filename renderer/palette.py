@@ -0,0 +1,155 @@
+# renderer/palette.py
+# 颜色深度与颜色量化
+
+from functools import lru_cache
+
+import numpy as np
+
+from core.tile import pack_colors
+
+"""
+[颜色深度]
+truecolor   24 位真彩色，颜色代码为打包颜色 0xRRGGBB
+256         xterm 256 色，颜色代码为调色板索引 16-255（6x6x6 色立方 + 24 级灰度）
+16          16 色，颜色代码为调色板索引 0-15
+mono        不输出颜色，颜色代码全部为 -1
+
+颜色代码 -1 表示透明（终端默认颜色）。
+降低颜色深度时，每种 RGB 颜色按查找表换算为最接近的调色板索引：
+查找表按每通道高 5 位建立 (32x32x32)，对整块地图只需一次向量化索引。
+"""
+
+# 可选的颜色深度，"auto" 表示根据终端能力检测
+COLOR_DEPTHS = ("truecolor", "256", "16", "mono")
+
+# 查找表每通道使用的位数
+LUT_BITS = 5
+
+# 标准 16 色 (xterm 默认值)
+ANSI_16 = [
+    (0, 0, 0),
+    (205, 0, 0),
+    (0, 205, 0),
+    (205, 205, 0),
+    (0, 0, 238),
+    (205, 0, 205),
+    (0, 205, 205),
+    (229, 229, 229),
+    (127, 127, 127),
+    (255, 0, 0),
+    (0, 255, 0),
+    (255, 255, 0),
+    (92, 92, 255),
+    (255, 0, 255),
+    (0, 255, 255),
+    (255, 255, 255),
+]
+
+
+def xterm_256():
+    """
+    xterm 256 色中与终端主题无关的部分（索引 16-255）
+    :return: (240, 3) 颜色数组，第 i 行对应索引 16 + i
+    """
+    levels = np.array([0, 95, 135, 175, 215, 255])
+    cube = np.stack(np.meshgrid(levels, levels, levels, indexing="ij"), axis=-1)
+    gray = np.repeat(np.arange(8, 248, 10)[:, None], 3, axis=1)
+    return np.concatenate([cube.reshape(-1, 3), gray])
+
+
+def detect_depth(term) -> str:
+    """
+    根据终端支持的颜色数选择颜色深度
+    :param term: blessed.Terminal 对象
+    """
+    colors = term.number_of_colors
+    if colors >= 1 << 24:
+        return "truecolor"
+    if colors >= 256:
+        return "256"
+    if colors >= 8:
+        return "16"
+    return "mono"
+
+
+@lru_cache(maxsize=None)
+def build_lut(depth: str):
+    """
+    建立 RGB -> 调色板索引查找表
+    :return: (32, 32, 32) uint8，下标为各通道高 5 位
+    """
+    if depth == "256":
+        palette, offset = xterm_256(), 16
+    else:
+        palette, offset = np.array(ANSI_16), 0
+
+    # 每个查找表格子取区间中心的颜色
+    size = 1 << LUT_BITS
+    step = 256 // size
+    centers = np.arange(size) * step + step // 2
+    rgb = np.stack(np.meshgrid(centers, centers, centers, indexing="ij"), axis=-1)
+    rgb = rgb.reshape(-1, 3).astype(np.float32)
+    palette = palette.astype(np.float32)
+
+    # |c - p|² = |c|² - 2c·p + |p|²，|c|² 与选择无关，一次矩阵乘法得到全部距离
+    dist = (palette**2).sum(axis=1) - 2 * rgb @ palette.T
+    lut = (dist.argmin(axis=1) + offset).astype(np.uint8)
+    return lut.reshape(size, size, size)
+
+
+class Quantizer:
+    """
+    颜色量化器
+    - 将打包颜色 0xRRGGBB 转为当前颜色深度的颜色代码
+    - 同一颜色深度的量化器结果相同，可以互相比较
+    """
+
+    def __init__(self, depth: str = "truecolor"):
+        """
+        :param depth: 颜色深度 truecolor / 256 / 16 / mono
+        """
+        if depth not in COLOR_DEPTHS:
+            raise ValueError(f"不支持的颜色深度: {depth}")
+        self.depth = depth
+        self.lut = build_lut(depth) if depth in ("256", "16") else None
+
+    def __eq__(self, other):
+        return isinstance(other, Quantizer) and other.depth == self.depth
+
+    def __hash__(self):
+        return hash(self.depth)
+
+    def __repr__(self):
+        return f"Quantizer({self.depth!r})"
+
+    def quantize(self, packed):
+        """
+        打包颜色数组转为颜色代码
+        :param packed: int 数组，0xRRGGBB，-1 表示透明
+        :return: int32 数组（新数组），透明为 -1
+        """
+        packed = np.asarray(packed, dtype=np.int32)
+        if self.depth == "truecolor":
+            return packed.copy()
+        if self.depth == "mono":
+            return np.full(packed.shape, -1, dtype=np.int32)
+
+        shift = 8 - LUT_BITS
+        r = (packed >> (16 + shift)) & ((1 << LUT_BITS) - 1)
+        g = (packed >> (8 + shift)) & ((1 << LUT_BITS) - 1)
+        b = (packed >> shift) & ((1 << LUT_BITS) - 1)
+        codes = self.lut[r, g, b].astype(np.int32)
+        codes[packed < 0] = -1
+        return codes
+
+    def quantize_tiles(self, tiles):
+        """
+        地图格子的颜色代码平面
+        :param tiles: 紧凑格式数组
+        :return: int16 数组（调色板索引不超过 255，节省内存）
+        """
+        return self.quantize(pack_colors(tiles)).astype(np.int16)
+
+    def quantize_one(self, color: int) -> int:
+        """单个打包颜色转为颜色代码"""
+        return int(self.quantize(np.array([color]))[0])
@@ -11,13 +11,27 @@ class Translator:
     - 自动加载 translation 目录下的 JSON 文件
     - 提供 get_list() 获取数组类型翻译
     - 提供 t() 获取字符串模板翻译并可格式化
+    - version 在切换语言时递增，用于判断缓存的翻译文本是否失效
     """
 
     def __init__(self, lang="zh-CN"):
-        self.lang = lang
+        self.version = 0
+        self._lang = lang
         self.translations = {}
         self.load_translation_files()
 
+    @property
+    def lang(self):
+        """当前语言"""
+        return self._lang
+
+    @lang.setter
+    def lang(self, value):
+        """切换语言"""
+        if value != self._lang:
+            self._lang = value
+            self.version += 1
+
     def load_translation_files(self):
         """自动加载 translation 目录下的所有 .json 文件"""
         translation_dir = Path("translation")
@@ -31,6 +45,7 @@ class Translator:
                 if isinstance(data, dict):
                     key = json_file.stem  # 文件名（不含扩展名）
                     self.translations[key] = data
+                    self.version += 1
             except json.JSONDecodeError:
                 print(f"无法解析 {json_file.name}，不是有效的 JSON")
 